@@ -0,0 +1,175 @@
+"""Binary library of solver-vetted deals, read through mmap.
+
+Layout (little endian):
+    header   "SDLB", version u16, record size u16, record count u32, reserved u32
+    records  seed u64, solution length u16, difficulty u8, reserved u8, 52 card bytes
+
+The optional sidecar <library>.idx lists record numbers grouped by
+difficulty so a filtered pick needs no scan:
+    header   "SDLI", level count u32
+    levels   (first entry, entry count) u32 pairs, one per difficulty
+    entries  record numbers, u32
+
+Build a library from analyze.py output with
+    python DealLibrary.py results.csv deals.lib
+"""
+import csv
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+from GameState import shuffledDeck
+
+HEADER = struct.Struct("<4sHHII")
+RECORD = struct.Struct("<QHBB52s")
+INDEX_HEADER = struct.Struct("<4sI")
+INDEX_ENTRY = struct.Struct("<I")
+VERSION = 1
+
+# solver nodes needed -> difficulty 0 (easy) .. 3 (expert)
+DIFFICULTY_NODES = [100, 1000, 10000]
+DIFFICULTIES = len(DIFFICULTY_NODES) + 1
+
+
+def difficultyOf(nodes: int) -> int:
+    for level, limit in enumerate(DIFFICULTY_NODES):
+        if nodes < limit:
+            return level
+    return len(DIFFICULTY_NODES)
+
+
+class DealLibrary:
+    def __init__(self, path: str):
+        self.path = path
+        self.levels = None
+        self.entries = 0        # offset of the index entries
+        self.indexMap = None
+        self.indexFile = None
+        self.map = None
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, size, self.count, _ = HEADER.unpack_from(self.map, 0)
+            if magic != b"SDLB" or version != VERSION or size != RECORD.size:
+                raise ValueError(f"{path} is not a version {VERSION} deal library.")
+            if HEADER.size + self.count * RECORD.size > len(self.map):
+                raise ValueError(f"{path} is truncated.")
+        except (OSError, ValueError, struct.error):
+            self.close()
+            raise
+        if os.path.exists(path + ".idx"):
+            self.openIndex(path + ".idx")
+
+    @classmethod
+    def open(cls, path: str):
+        """The library at path, or None if it is missing or unreadable."""
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def openIndex(self, path: str):
+        """Map the difficulty index; an unreadable one is ignored."""
+        try:
+            self.indexFile = open(path, "rb")
+            self.indexMap = mmap.mmap(self.indexFile.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, levels = INDEX_HEADER.unpack_from(self.indexMap, 0)
+            if magic != b"SDLI":
+                self.closeIndex()
+                return
+            pairs = struct.unpack_from(f"<{2 * levels}I", self.indexMap, INDEX_HEADER.size)
+            self.entries = INDEX_HEADER.size + 8 * levels
+            room = (len(self.indexMap) - self.entries) // INDEX_ENTRY.size
+            if any(first + count > room for first, count in zip(pairs[::2], pairs[1::2])):
+                self.closeIndex()
+                return
+            self.levels = list(zip(pairs[::2], pairs[1::2]))
+        except (OSError, ValueError, struct.error):
+            self.closeIndex()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, number: int):
+        """(seed, solution length, difficulty, deal order) of one record."""
+        seed, moves, difficulty, _, order = RECORD.unpack_from(self.map, HEADER.size + number * RECORD.size)
+        return seed, moves, difficulty, order
+
+    def sample(self, difficulty: int=None, rng=random):
+        """A random record, optionally of one difficulty (needs the .idx file)."""
+        if difficulty is not None and self.levels is not None and difficulty < len(self.levels):
+            first, count = self.levels[difficulty]
+            if count:
+                offset = self.entries + (first + rng.randrange(count)) * INDEX_ENTRY.size
+                number = INDEX_ENTRY.unpack_from(self.indexMap, offset)[0]
+                if number < self.count:
+                    return self.record(number)
+        if not self.count:
+            return None
+        return self.record(rng.randrange(self.count))
+
+    def closeIndex(self):
+        self.levels = None
+        if self.indexMap is not None:
+            self.indexMap.close()
+            self.indexMap = None
+        if self.indexFile is not None:
+            self.indexFile.close()
+            self.indexFile = None
+
+    def close(self):
+        self.closeIndex()
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+def writeLibrary(path: str, records):
+    """Write (seed, solution length, nodes) tuples as a library plus its index."""
+    levels = [[] for _ in range(DIFFICULTIES)]
+    count = 0
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(b"SDLB", VERSION, RECORD.size, 0, 0))
+        for seed, moves, nodes in records:
+            difficulty = difficultyOf(nodes)
+            f.write(RECORD.pack(seed, min(moves, 0xFFFF), difficulty, 0, bytes(shuffledDeck(seed))))
+            levels[difficulty].append(count)
+            count += 1
+        f.seek(0)
+        f.write(HEADER.pack(b"SDLB", VERSION, RECORD.size, count, 0))
+    with open(path + ".idx.tmp", "wb") as f:
+        f.write(INDEX_HEADER.pack(b"SDLI", len(levels)))
+        first = 0
+        for level in levels:
+            f.write(struct.pack("<II", first, len(level)))
+            first += len(level)
+        for level in levels:
+            f.write(struct.pack(f"<{len(level)}I", *level))
+    os.replace(path + ".tmp", path)
+    os.replace(path + ".idx.tmp", path + ".idx")
+    return count
+
+def readResults(path: str):
+    """Winnable (seed, moves, nodes) rows from an analyze.py results file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f) if not path.endswith(".jsonl") else f
+        for row in rows:
+            if isinstance(row, str):
+                try:
+                    row = json.loads(row)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+            if row.get("winnable") == "yes" and row.get("seconds"):
+                yield int(row["seed"]), int(row["moves"]), int(row["nodes"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python DealLibrary.py <results.csv|results.jsonl> <library>")
+        sys.exit(1)
+    count = writeLibrary(sys.argv[2], readResults(sys.argv[1]))
+    print(f"Wrote {count} deals to {sys.argv[2]}")
@@ -0,0 +1,59 @@
+"""Search for a proven-winnable deal on a Qt thread pool.
+
+Winnable-only mode without a deal library deals random shuffles the solver
+has won. Proving one can take several solver runs, so MainWindow starts the
+search for the next deal as soon as it needs one and New Game takes the
+result instead of solving on the GUI thread. The search gets a pool of
+its own with one thread, so it never holds up hints or card rendering on
+the global pool.
+"""
+import random
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from GameState import GameState, shuffledDeck
+from Solver import Solver
+
+_pool = None    # created with the first search
+
+
+class DealJob(QObject):
+    """One search; finished carries the job, with seed set unless it was cancelled."""
+    finished = pyqtSignal(object)
+
+    def __init__(self, drawCount: int, timeLimit: float):
+        super().__init__()
+        self.drawCount = drawCount
+        self.timeLimit = timeLimit
+        self.seed = None
+        self.tried = 0          # shuffles handed to the solver so far
+        self.cancelled = False  # checked between shuffles
+        self.done = False
+
+
+class DealTask(QRunnable):
+    def __init__(self, job: DealJob):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        job = self.job
+        state = GameState(job.drawCount)
+        while not job.cancelled:
+            seed = random.randrange(2**32)
+            state.deal(shuffledDeck(seed))
+            job.tried += 1
+            if Solver(state, timeLimit=job.timeLimit).solve():
+                job.seed = seed
+                break
+        job.done = True
+        job.finished.emit(job)
+
+
+def requestDeal(drawCount: int, timeLimit: float) -> DealJob:
+    """Start looking for a winnable seed at drawCount, timeLimit solver seconds per shuffle."""
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(1)
+    job = DealJob(drawCount, timeLimit)
+    _pool.start(DealTask(job))
+    return job
@@ -0,0 +1,129 @@
+"""Frame-time and input-latency overlay for MainWindow.
+
+While enabled, an event filter on the view's viewport times every paint
+and notes mouse presses; each frame lands in a fixed-size ring buffer with
+the number of running card animations and the pixmap memory SVGManager
+holds. Disabled, the filter is removed and nothing runs at all.
+
+dump() writes the buffer as a Chrome trace (chrome://tracing, Perfetto).
+"""
+import json
+import math
+import time
+from array import array
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QLabel
+
+FRAMES = 1024       # frames kept in the ring buffer
+REFRESH_MS = 250    # overlay text update interval
+
+
+class FrameProfiler(QObject):
+    def __init__(self, window, size: int=FRAMES):
+        super().__init__(window)
+        self.window = window
+        self.size = size
+        self.start = array("d", [0.0]) * size     # perf_counter() when the paint began
+        self.paint = array("d", [0.0]) * size     # ms spent painting
+        self.latency = array("d", [0.0]) * size   # ms from a mouse press to the end of this paint, or nan
+        self.animations = array("H", [0]) * size
+        self.memory = array("d", [0.0]) * size    # MB of pixmaps held by SVGManager
+        self.count = 0      # frames recorded; the newest is at (count - 1) % size
+        self.pressed = None
+        self.lastLatency = None
+        self.enabled = False
+        self.label = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        if self.label is None:
+            self.label = QLabel(self.window)
+            self.label.setStyleSheet("background: #000000; color: #7CFC8A; font-family: monospace; padding: 4px;")
+            self.label.move(8, 8)
+        self.label.show()
+        self.window.viewport().installEventFilter(self)
+        self.timer.start(REFRESH_MS)
+        self.refresh()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.window.viewport().removeEventFilter(self)
+        self.timer.stop()
+        self.label.hide()
+        self.pressed = None
+
+    def toggle(self):
+        self.disable() if self.enabled else self.enable()
+
+    def eventFilter(self, obj, event):
+        kind = event.type()
+        if kind == QEvent.Paint:
+            begin = time.perf_counter()
+            self.window.viewportEvent(event)
+            end = time.perf_counter()
+            self.record(begin, end)
+            return True
+        if kind == QEvent.MouseButtonPress and self.pressed is None:
+            self.pressed = time.perf_counter()
+        return False
+
+    def record(self, begin: float, end: float):
+        i = self.count % self.size
+        self.start[i] = begin
+        self.paint[i] = (end - begin) * 1000
+        if self.pressed is not None:
+            self.lastLatency = (end - self.pressed) * 1000
+            self.latency[i] = self.lastLatency
+            self.pressed = None
+        else:
+            self.latency[i] = math.nan
+        self.animations[i] = self.window.animator.liveCount
+        self.memory[i] = self.window.svg.memoryUsed / 1024 / 1024
+        self.count += 1
+
+    def frames(self, seconds: float=None) -> list:
+        """Buffer indexes of the recorded frames, oldest first, optionally only
+        those of the last seconds."""
+        first = max(0, self.count - self.size)
+        indexes = [n % self.size for n in range(first, self.count)]
+        if seconds is not None:
+            since = time.perf_counter() - seconds
+            indexes = [i for i in indexes if self.start[i] >= since]
+        return indexes
+
+    def summary(self) -> str:
+        paints = [self.paint[i] for i in self.frames(1.0)]
+        latency = f"{self.lastLatency:5.1f} ms" if self.lastLatency is not None else "    -"
+        return "\n".join([f"FPS {len(paints):4d}",
+                          f"paint {sum(paints) / len(paints) if paints else 0:5.1f} ms  max {max(paints, default=0):5.1f}",
+                          f"animations {self.window.animator.liveCount}",
+                          f"pixmaps {self.window.svg.memoryUsed / 1024 / 1024:.1f} MB",
+                          f"press->paint {latency}"])
+
+    def refresh(self):
+        self.label.setText(self.summary())
+        self.label.adjustSize()
+
+    def dump(self, path: str) -> int:
+        """Write the buffered frames to path as a Chrome trace; returns the frame count."""
+        indexes = self.frames()
+        origin = self.start[indexes[0]] if indexes else 0.0
+        events = []
+        for i in indexes:
+            ts = (self.start[i] - origin) * 1e6
+            events.append({"name": "paint", "ph": "X", "ts": ts, "dur": self.paint[i] * 1000, "pid": 1, "tid": 1})
+            if not math.isnan(self.latency[i]):
+                end = ts + self.paint[i] * 1000
+                events.append({"name": "press to paint", "ph": "X", "ts": end - self.latency[i] * 1000,
+                               "dur": self.latency[i] * 1000, "pid": 1, "tid": 2})
+            events.append({"name": "animations", "ph": "C", "ts": ts, "pid": 1, "args": {"live": self.animations[i]}})
+            events.append({"name": "pixmaps", "ph": "C", "ts": ts, "pid": 1, "args": {"MB": round(self.memory[i], 2)}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(indexes)
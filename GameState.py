@@ -0,0 +1,401 @@
+"""Qt-free Klondike rules and game state.
+
+A card is an integer 0..51 (suit * 13 + value - 1, suits in SUITS order) and
+a table is 13 piles of such integers: the stock, the waste, the four
+foundations (one per suit, in SUITS order) and the seven tableau columns.
+Only the tableau can hold face-down cards; they always sit at the bottom of
+their column, so a single count per pile describes them.
+
+Besides the piles the state keeps indexes that every move updates in place:
+the pile and position of each card and the totals of face-down and
+foundation cards, so lookups and the win/auto-complete checks never scan.
+
+Moves are journaled as one 16-bit word each (see packRecord), which is
+all undo and redo need: a flip or a recycle is derived from the record.
+
+A draw turns drawCount cards (fewer when the stock runs low) from the stock
+onto the waste; only the top waste card can be played.
+
+Whether a card may go onto a pile is one lookup in TABLEAU_FITS or
+FOUNDATION_FITS, built at import and indexed by the card and the pile's top
+card (EMPTY for an empty pile).
+"""
+import random
+from array import array
+
+SUITS = ["Spades", "Hearts", "Diamonds", "Clubs"]
+RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+
+STOCK = 0
+WASTE = 1
+FOUNDATION = 2  # piles 2..5
+TABLEAU = 6     # piles 6..12
+PILES = 13
+
+FLIPPED = 1     # the move turned a tableau card face-up
+PLUCKED = 2     # auto-complete took a card from inside the stock/waste
+
+EMPTY = 52      # the top card of an empty pile in the fit tables
+
+
+def cardCode(value: int, suit: int) -> int:
+    return suit * 13 + value - 1
+
+def cardValue(card: int) -> int:
+    return card % 13 + 1
+
+def cardSuit(card: int) -> int:
+    return card // 13
+
+def isRed(card: int) -> bool:
+    return 13 <= card < 39
+
+def cardName(card: int) -> str:
+    return f"{RANKS[card % 13]}{SUITS[card // 13][0]}"
+
+def _fitTable(rule) -> bytes:
+    """rule(card, top) for every card and top card (or EMPTY), at card * 53 + top."""
+    return bytes(bool(rule(card, top)) for card in range(52) for top in range(EMPTY + 1))
+
+# TABLEAU_FITS[card * 53 + top]: card can be stacked on top, a king on an empty column
+TABLEAU_FITS = _fitTable(lambda card, top: card % 13 == 12 if top == EMPTY else
+                         top % 13 == card % 13 + 1 and isRed(top) != isRed(card))
+# FOUNDATION_FITS[card * 53 + top]: card can go onto top, an ace onto an empty
+# foundation; which foundation that is comes from HOME
+FOUNDATION_FITS = _fitTable(lambda card, top: card % 13 == 0 if top == EMPTY else
+                            card % 13 and top == card - 1)
+HOME = bytes(FOUNDATION + card // 13 for card in range(52))
+
+def packRecord(src: int, dst: int, count: int, flags: int) -> int:
+    """A journal word: source and destination pile (4 bits each), card count or
+    plucked position (5 bits) and flags (2 bits). A recycle is WASTE -> STOCK."""
+    return src << 11 | dst << 7 | count << 2 | flags
+
+def unpackRecord(word: int) -> tuple:
+    return word >> 11, word >> 7 & 15, word >> 2 & 31, word & 3
+
+def shuffledDeck(seed: int) -> list:
+    """The deal order for a seed; every new game is one of these."""
+    deck = list(range(52))
+    random.Random(seed).shuffle(deck)
+    return deck
+
+
+class GameState:
+    def __init__(self, drawCount: int=1):
+        self.drawCount = drawCount
+        self.piles = [[] for _ in range(PILES)]
+        self.hidden = [0] * PILES
+        self.history = array("H")   # packed records of the moves played
+        self.future = array("H")    # undone records, for redo
+        self.cardPile = [STOCK] * 52
+        self.cardPos = [0] * 52
+        self.faceDown = 0   # face-down tableau cards
+        self.founded = 0    # cards on the foundations
+
+    def reindex(self):
+        """Rebuild the card indexes and totals from the piles."""
+        for pile in range(PILES):
+            self._place(pile, 0)
+        self.faceDown = sum(self.hidden)
+        self.founded = sum(len(self.piles[i]) for i in range(FOUNDATION, TABLEAU))
+
+    def _place(self, pile: int, start: int):
+        """Record the pile and position of piles[pile][start:]."""
+        cards = self.piles[pile]
+        cardPile, cardPos = self.cardPile, self.cardPos
+        for pos in range(start, len(cards)):
+            card = cards[pos]
+            cardPile[card] = pile
+            cardPos[card] = pos
+
+    def locate(self, card: int):
+        """(pile, position) of a card."""
+        return self.cardPile[card], self.cardPos[card]
+
+    def deal(self, order):
+        """Deal 52 cards the way MainWindow.ShuffleCards lays them out."""
+        for pile in self.piles:
+            pile.clear()
+        self.hidden = [0] * PILES
+        self.history = array("H")
+        self.future = array("H")
+        self.piles[STOCK].extend(order[:24])
+        n = 24
+        for i in range(7):
+            self.piles[TABLEAU + i].extend(order[n:n + i + 1])
+            self.hidden[TABLEAU + i] = i
+            n += i + 1
+        self.reindex()
+
+    def copy(self) -> "GameState":
+        state = GameState(self.drawCount)
+        state.piles = [pile[:] for pile in self.piles]
+        state.hidden = self.hidden[:]
+        state.history = self.history[:]
+        state.future = self.future[:]
+        state.cardPile = self.cardPile[:]
+        state.cardPos = self.cardPos[:]
+        state.faceDown = self.faceDown
+        state.founded = self.founded
+        return state
+
+    def pack(self) -> bytes:
+        """52 card bytes preceded by the 13 pile lengths and 13 face-down counts
+        and followed by the draw count."""
+        data = bytearray(len(pile) for pile in self.piles)
+        data.extend(self.hidden)
+        for pile in self.piles:
+            data.extend(pile)
+        data.append(self.drawCount)
+        return bytes(data)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "GameState":
+        """Inverse of pack(); data without the draw count is a draw-1 game."""
+        state = cls()
+        state.hidden = list(data[PILES:2 * PILES])
+        n = 2 * PILES
+        for i in range(PILES):
+            state.piles[i] = list(data[n:n + data[i]])
+            n += data[i]
+        if len(data) > n:
+            state.drawCount = data[n]
+        state.reindex()
+        return state
+
+    def isFaceUp(self, pile: int, pos: int) -> bool:
+        return pile != STOCK and pos >= self.hidden[pile]
+
+    def isWon(self) -> bool:
+        return self.founded == 52
+
+    def canAutoComplete(self) -> bool:
+        return not self.faceDown
+
+    def drawSize(self) -> int:
+        """Cards the next draw turns over."""
+        return min(self.drawCount, len(self.piles[STOCK]))
+
+    # ---- rules ----
+
+    def _fits(self, card: int, dst: int) -> bool:
+        pile = self.piles[dst]
+        top = pile[-1] if pile else EMPTY
+        if dst >= TABLEAU:
+            return TABLEAU_FITS[card * 53 + top] == 1
+        return dst == HOME[card] and FOUNDATION_FITS[card * 53 + top] == 1
+
+    def isLegal(self, move) -> bool:
+        src, dst, count = move
+        piles = self.piles
+        if src == STOCK:
+            return dst == WASTE and count == self.drawSize() > 0
+        if src == WASTE and dst == STOCK:
+            return not piles[STOCK] and count == len(piles[WASTE]) > 0
+        if src == dst or dst < FOUNDATION or count < 1:
+            return False
+        pile = piles[src]
+        if count > len(pile) - self.hidden[src]:
+            return False
+        if src < TABLEAU and count != 1:
+            return False
+        if dst < TABLEAU and count != 1:
+            return False
+        return self._fits(pile[-count], dst)
+
+    def legalMoves(self) -> list:
+        moves = []
+        piles = self.piles
+        hidden = self.hidden
+        tops = [(dst, piles[dst][-1] if piles[dst] else EMPTY) for dst in range(TABLEAU, PILES)]
+        for src in range(WASTE, PILES):
+            pile = piles[src]
+            if not pile:
+                continue
+            if src >= TABLEAU:
+                first = hidden[src]
+            else:
+                first = len(pile) - 1
+            for pos in range(first, len(pile)):
+                card = pile[pos]
+                row = card * 53
+                count = len(pile) - pos
+                if count == 1:
+                    home = piles[HOME[card]]
+                    if FOUNDATION_FITS[row + (home[-1] if home else EMPTY)]:
+                        moves.append((src, HOME[card], 1))
+                for dst, top in tops:
+                    if TABLEAU_FITS[row + top] and dst != src:
+                        moves.append((src, dst, count))
+        if piles[STOCK]:
+            moves.append((STOCK, WASTE, self.drawSize()))
+        elif piles[WASTE]:
+            moves.append((WASTE, STOCK, len(piles[WASTE])))
+        return moves
+
+    def automaticMove(self, src: int, pos: int):
+        """The move a click on piles[src][pos] makes: foundation first, then
+        the leftmost tableau column that takes the card (and those above it)."""
+        pile = self.piles[src]
+        if src == STOCK or not self.isFaceUp(src, pos) or pos >= len(pile):
+            return None
+        count = len(pile) - pos
+        card = pile[pos]
+        if src < TABLEAU and count != 1:
+            return None
+        if count == 1 and self._fits(card, HOME[card]):
+            return (src, HOME[card], 1)
+        for dst in range(TABLEAU, PILES):
+            if dst != src and self._fits(card, dst):
+                return (src, dst, count)
+        return None
+
+    # ---- state changes ----
+
+    def apply(self, move) -> int:
+        """Play a legal move and return its flags (FLIPPED)."""
+        src, dst, count = move
+        piles = self.piles
+        flags = 0
+        if src == STOCK:
+            stock, waste = piles[STOCK], piles[WASTE]
+            for _ in range(count):
+                waste.append(stock.pop())
+            self._place(WASTE, len(waste) - count)
+        elif src == WASTE and dst == STOCK:
+            piles[STOCK][:] = piles[WASTE][::-1]
+            piles[WASTE].clear()
+            self._place(STOCK, 0)
+        else:
+            pile = piles[src]
+            moved = pile[-count:]
+            del pile[-count:]
+            target = piles[dst]
+            pos = len(target)
+            target.extend(moved)
+            for card in moved:
+                self.cardPile[card] = dst
+                self.cardPos[card] = pos
+                pos += 1
+            if pile and self.hidden[src] == len(pile):
+                self.hidden[src] -= 1
+                self.faceDown -= 1
+                flags = FLIPPED
+            if dst < TABLEAU:
+                self.founded += 1
+            if FOUNDATION <= src < TABLEAU:
+                self.founded -= 1
+        self.history.append(src << 11 | dst << 7 | count << 2 | flags)  # packRecord, inlined
+        if self.future:
+            del self.future[:]
+        return flags
+
+    def nextCollect(self):
+        """Next (pile, position) auto-complete sends to a foundation: anywhere
+        in the waste first, then a tableau top, then anywhere in the stock.
+        Only the four cards the foundations need next are looked up."""
+        piles = self.piles
+        best = None
+        for suit in range(4):
+            height = len(piles[FOUNDATION + suit])
+            if height == 13:
+                continue
+            card = suit * 13 + height
+            pile, pos = self.cardPile[card], self.cardPos[card]
+            if pile >= TABLEAU:
+                if pos != len(piles[pile]) - 1:
+                    continue
+                order = (1, pile)
+            elif pile == WASTE:
+                order = (0, pos)
+            elif pile == STOCK:
+                order = (2, pos)
+            else:
+                continue
+            if best is None or order < best[0]:
+                best = (order, (pile, pos))
+        return best[1] if best is not None else None
+
+    def collectPlan(self) -> list:
+        """Every (pile, position) auto-complete collects from here, in order."""
+        state = self.copy()
+        plan = []
+        step = state.nextCollect()
+        while step is not None:
+            plan.append(step)
+            state.collect(*step)
+            step = state.nextCollect()
+        return plan
+
+    def collect(self, src: int, pos: int) -> int:
+        """Move piles[src][pos] straight onto its foundation (auto-complete only)."""
+        pile = self.piles[src]
+        card = pile.pop(pos)
+        dst = HOME[card]
+        self.piles[dst].append(card)
+        self._place(src, pos)
+        self._place(dst, len(self.piles[dst]) - 1)
+        self.founded += 1
+        flags = PLUCKED
+        if src >= TABLEAU and pile and self.hidden[src] == len(pile):
+            self.hidden[src] -= 1
+            self.faceDown -= 1
+            flags |= FLIPPED
+        self.history.append(packRecord(src, dst, pos, flags))
+        if self.future:
+            del self.future[:]
+        return flags
+
+    def moves(self) -> list:
+        """The (src, dst, count) moves played so far."""
+        return [unpackRecord(word)[:3] for word in self.history]
+
+    def undo(self):
+        """Revert the last move and return its (src, dst, count, flags) record."""
+        if not self.history:
+            return None
+        word = self.history.pop()
+        self.future.append(word)
+        src, dst, count, flags = record = unpackRecord(word)
+        piles = self.piles
+        if flags & FLIPPED:
+            self.hidden[src] += 1
+            self.faceDown += 1
+        if flags & PLUCKED:
+            piles[src].insert(count, piles[dst].pop())
+            self._place(src, count)
+            self.founded -= 1
+        elif src == STOCK:
+            stock, waste = piles[STOCK], piles[WASTE]
+            for _ in range(count):
+                stock.append(waste.pop())
+            self._place(STOCK, len(stock) - count)
+        elif src == WASTE and dst == STOCK:
+            piles[WASTE][:] = piles[STOCK][::-1]
+            piles[STOCK].clear()
+            self._place(WASTE, 0)
+        else:
+            pile = piles[dst]
+            piles[src].extend(pile[-count:])
+            del pile[-count:]
+            self._place(src, len(piles[src]) - count)
+            if dst < TABLEAU:
+                self.founded -= 1
+            if FOUNDATION <= src < TABLEAU:
+                self.founded += 1
+        return record
+
+    def redo(self):
+        """Replay the last undone move and return its record."""
+        if not self.future:
+            return None
+        future = self.future
+        self.future = array("H")
+        src, dst, count, flags = unpackRecord(future.pop())
+        if flags & PLUCKED:
+            self.collect(src, count)
+        else:
+            self.apply((src, dst, count))
+        self.future = future
+        return unpackRecord(self.history[-1])
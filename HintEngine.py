@@ -0,0 +1,97 @@
+"""Move hints, searched on the Qt thread pool within a latency budget.
+
+Candidates are exactly GameState.legalMoves(), the rules MainWindow.CheckMove
+and CheckAutomaticMoves play by. They are ranked by a one-move heuristic
+right away; the rest of the budget goes to the solver, whose first move
+replaces the heuristic pick when it finds a win.
+
+The player cannot see the face-down tableau cards, so neither does the
+hint: the solver runs on copies with those cards dealt out again at random
+(WinEstimate.sampleHidden) and the first move that wins most of them is
+picked.
+"""
+import random
+import time
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from GameState import GameState, STOCK, WASTE, TABLEAU
+from Solver import Solver, isSafe
+from WinEstimate import sampleHidden
+
+HINT_SAMPLES = 3    # re-dealings of the face-down cards the solver votes over
+
+
+def scoreMove(state: GameState, move) -> float:
+    src, dst, count = move
+    piles = state.piles
+    if src == STOCK:
+        return 0.5
+    if dst == STOCK:
+        return 0.2
+    card = piles[src][-count]
+    if dst < TABLEAU:
+        return 6.0 if isSafe(card, piles) else 5.0
+    pos = len(piles[src]) - count
+    if src >= TABLEAU:
+        if pos == 0:
+            return 0.0 if card % 13 == 12 else 1.0  # a king moving between empty columns
+        if pos == state.hidden[src]:
+            return 4.0 + state.hidden[src] / 10     # turns a card face-up, deep columns first
+        return 0.1
+    if src == WASTE:
+        return 3.0
+    return -1.0     # taking a card back from a foundation
+
+def rankMoves(state: GameState) -> list:
+    """Legal moves, most promising first."""
+    return sorted(state.legalMoves(), key=lambda move: -scoreMove(state, move))
+
+
+class HintJob(QObject):
+    """One hint request; finished carries the job once its search has ended.
+    best holds the best move found so far and can be read at any time."""
+    finished = pyqtSignal(object)
+
+    def __init__(self, state: GameState, budget: float):
+        super().__init__()
+        self.state = state
+        self.budget = budget
+        self.best = None
+        self.proven = False     # best starts a line the solver won on sampled tables
+        self.done = False
+
+
+class HintTask(QRunnable):
+    def __init__(self, job: HintJob):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        job = self.job
+        deadline = time.perf_counter() + job.budget
+        ranked = rankMoves(job.state)
+        if ranked:
+            job.best = ranked[0]
+            if not job.state.canAutoComplete():
+                votes = {}
+                rng = random.Random()
+                samples = HINT_SAMPLES if job.state.faceDown else 1
+                for n in range(samples, 0, -1):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    solver = Solver(sampleHidden(job.state, rng), timeLimit=remaining / n)
+                    if solver.solve() and solver.solution and job.state.isLegal(solver.solution[0]):
+                        move = solver.solution[0]
+                        votes[move] = votes.get(move, 0) + 1
+                if votes:
+                    job.best = max(votes, key=votes.get)
+                    job.proven = True
+        job.done = True
+        job.finished.emit(job)
+
+
+def requestHint(state: GameState, budget: float=0.05) -> HintJob:
+    """Start searching for a hint on a copy of state."""
+    job = HintJob(state.copy(), budget)
+    QThreadPool.globalInstance().start(HintTask(job))
+    return job
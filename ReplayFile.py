@@ -0,0 +1,92 @@
+"""Append-only move stream of one deal, for reproducing and replaying games.
+
+Layout (little endian):
+    header   "SRPL", version u16, seed u64, draw count u8 (version 2 on;
+             version 1 replays are draw-1)
+    records  one u16 per state change: a GameState journal word (see
+             packRecord), or UNDO / REDO
+
+Every record is written as it happens, so the file is usable even if the
+game crashes; a trailing half record is ignored when reading.
+"""
+import os
+import struct
+import sys
+from array import array
+from GameState import GameState, PLUCKED, shuffledDeck, unpackRecord
+
+HEADER = struct.Struct("<4sHQB")
+HEADER_V1 = struct.Struct("<4sHQ")
+VERSION = 2
+UNDO = 0xFFFF
+REDO = 0xFFFE
+
+
+class ReplayError(ValueError):
+    pass
+
+
+class ReplayWriter:
+    def __init__(self, path: str, seed: int, records=(), drawCount: int=1):
+        """Start the replay of a deal, optionally with the moves already played."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+        self.seed = seed
+        records = array("H", records)
+        if sys.byteorder == "big":
+            records.byteswap()
+        os.write(self.fd, HEADER.pack(b"SRPL", VERSION, seed, drawCount) + records.tobytes())
+
+    def record(self, word: int):
+        os.write(self.fd, struct.pack("<H", word))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def readReplay(path: str):
+    """(seed, array of records, draw count) of a replay file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        magic, version, seed = HEADER_V1.unpack_from(data, 0)
+        header = HEADER if version > 1 else HEADER_V1
+        drawCount = header.unpack_from(data, 0)[3] if version > 1 else 1
+    except struct.error:
+        raise ReplayError(f"{path} is too short to be a replay.")
+    if magic != b"SRPL" or not 1 <= version <= VERSION:
+        raise ReplayError(f"{path} is not a version 1 to {VERSION} replay.")
+    body = data[header.size:]
+    records = array("H")
+    records.frombytes(body[:len(body) & ~1])
+    if sys.byteorder == "big":
+        records.byteswap()
+    return seed, records, drawCount
+
+def replayGame(seed: int, records, state: GameState=None, drawCount: int=1) -> GameState:
+    """Re-play records on the deal of seed, checking each one against the rules."""
+    if state is None:
+        state = GameState()
+    state.drawCount = drawCount
+    state.deal(shuffledDeck(seed))
+    for n, word in enumerate(records):
+        if word == UNDO:
+            done = state.undo()
+        elif word == REDO:
+            done = state.redo()
+        else:
+            src, dst, count, flags = unpackRecord(word)
+            if flags & PLUCKED:
+                done = count < len(state.piles[src]) and state.nextCollect() == (src, count)
+                if done:
+                    state.collect(src, count)
+            else:
+                done = state.isLegal((src, dst, count))
+                if done:
+                    state.apply((src, dst, count))
+            done = done and state.history[-1] == word
+        if not done:
+            raise ReplayError(f"record {n} ({word:#06x}) cannot be played.")
+    return state
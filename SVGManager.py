@@ -1,18 +1,109 @@
 import os
+import hashlib
+from collections import OrderedDict
+import struct
+import threading
+import time
 from PyQt5.QtSvg import QSvgRenderer
-from PyQt5.QtGui import QPainter, QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPainter, QPixmap, QImage
+from PyQt5.QtCore import (Qt, QCoreApplication, QStandardPaths, QRectF, QObject, QRunnable, \
+                          QThreadPool, pyqtSignal)
+
+CACHE_LIMIT = 64 * 1024 * 1024  # bytes of rendered images kept on disk
+MEMORY_BUDGET = 96 * 1024 * 1024  # bytes of pixmaps kept in memory across sizes
+RASTER_HEADER = struct.Struct("<4sII")  # "ARGB", width, height, then premultiplied ARGB32 pixels
+
+
+def defaultCacheDir() -> str:
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    return os.path.join(base or os.path.expanduser("~"), "PremiumSolitaire", "raster")
+
+
+class Sprite:
+    """A sub-rect of a shared sprite sheet, used in place of its own pixmap."""
+    __slots__ = ("sheet", "source", "size")
+
+    def __init__(self, sheet: QPixmap, source: QRectF, size: tuple):
+        self.sheet = sheet
+        self.source = source    # in sheet pixels
+        self.size = size        # logical size it is drawn at
+
+
+class PrerenderJob(QObject):
+    """Tracks one prerender() batch; finished carries {name: QPixmap}."""
+    imageReady = pyqtSignal(str, QImage)
+    finished = pyqtSignal(object)
+
+    def __init__(self, manager, names: list, size: tuple, ratio: float):
+        super().__init__()
+        self.manager = manager
+        self.size = size
+        self.ratio = ratio
+        self.pending = set(names)
+        self.pixmaps = {}
+        self.done = False
+        self.cancelled = False  # set when the images are no longer wanted
+        self.imageReady.connect(self.addImage)
+
+    def addImage(self, name: str, image: QImage):
+        """Runs on the GUI thread: QPixmaps may only be made there."""
+        self.pixmaps[name] = self.manager.storeImage(name, self.size, image, self.ratio)
+        self.pending.discard(name)
+        if not self.pending and not self.done:
+            self.done = True
+            self.finished.emit(self.pixmaps)
+
+
+class RenderTask(QRunnable):
+    def __init__(self, manager, job: PrerenderJob, name: str, width: int, height: int):
+        super().__init__()
+        self.manager = manager
+        self.job = job
+        self.name = name
+        self.width = width
+        self.height = height
+
+    def run(self):
+        if self.job.cancelled:
+            return
+        image = self.manager.renderImage(self.name, self.width, self.height)
+        if not self.job.cancelled:
+            self.job.imageReady.emit(self.name, image)
+
 
 class SVGManager:
-    def __init__(self):
+    def __init__(self, warmup: bool=False, cacheDir: str=None, cacheLimit: int=CACHE_LIMIT,
+                 memoryBudget: int=MEMORY_BUDGET):
+        self.paths = {}
+        self.cards = []
         self.svgs = {}
-        self.cache = {}
+        self.renderLocks = {}   # name -> lock held while its QSvgRenderer paints
+        self.cache = {}         # (name, size, ratio) -> QPixmap
+        self.atlases = {}       # (names, size, ratio) -> (sheet, sprites)
+        self.lru = OrderedDict()  # (store, key) -> bytes, least recently used first
+        self.memoryBudget = memoryBudget
+        self.memoryUsed = 0
+        self.hashes = {}
+        self.lock = threading.Lock()
+        self.parseTime = 0.0    # seconds spent parsing on the GUI thread
+        self.backgroundTime = 0.0   # seconds spent parsing on other threads
+        self.devicePixelRatio = 1.0
+        self._stop = False
+        self._thread = None
+
+        self.cacheDir = cacheDir if cacheDir is not None else defaultCacheDir()
+        self.cacheLimit = cacheLimit
+        self.diskFiles = {}     # file name -> [size, last use]
+        self.diskHits = 0
+        self.diskMisses = 0
+        self.validateDiskCache()
+
         ownpath = os.path.dirname(os.path.abspath(__file__))
         path = os.path.join(ownpath, "images_svg")
         for svg in os.listdir(path):
             if svg.endswith(".svg"):
                 name = os.path.splitext(svg)[0]
-                self.loadSVG(name, os.path.join(path, svg))
+                self.paths[name] = os.path.join(path, svg)
         path = os.path.join(ownpath, "images_svg/Cards")
         for folder in os.listdir(path):
             folder_path = os.path.join(path, folder)
@@ -20,26 +111,340 @@ class SVGManager:
                 for svg in os.listdir(folder_path):
                     if svg.endswith(".svg"):
                         name = f"{folder}{os.path.splitext(svg)[0]}"
-                        self.loadSVG(name, os.path.join(folder_path, svg))
+                        self.paths[name] = os.path.join(folder_path, svg)
+                        self.cards.append(name)
+        if warmup:
+            self.warmUp()
 
-    def loadSVG(self, name, path):
-        renderer = QSvgRenderer(path)
-        self.svgs[name] = renderer
+    def loadSVG(self, name: str) -> QSvgRenderer:
+        """Parse an SVG the first time it is needed."""
+        renderer = self.svgs.get(name)
+        if renderer is not None:
+            return renderer
+        start = time.perf_counter()
+        renderer = QSvgRenderer(self.paths[name])
+        app = QCoreApplication.instance()
+        if app is not None and threading.current_thread() is not threading.main_thread():
+            renderer.moveToThread(app.thread())
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            if threading.current_thread() is threading.main_thread():
+                self.parseTime += elapsed
+            else:
+                self.backgroundTime += elapsed
+            return self.svgs.setdefault(name, renderer)
 
-    def getSVG(self, name: str, size: tuple) -> QPixmap:
-        key = (name, size)
+    def renderLock(self, name: str) -> threading.Lock:
+        """QSvgRenderer is not thread-safe: one renderer paints on one thread at a time."""
+        with self.lock:
+            return self.renderLocks.setdefault(name, threading.Lock())
+
+    def warmUp(self, names=None):
+        """Parse SVGs (by default the card faces and backside) on a background thread."""
+        if names is None:
+            names = ["backside"] + self.cards + ["reloadCard"]
+        self._thread = threading.Thread(target=self._warmUp, args=(names,), daemon=True)
+        self._thread.start()
+
+    def _warmUp(self, names):
+        cached = {file.split("-")[0] for file in self.diskFiles}
+        for name in names:
+            if self._stop:
+                return
+            if name in self.paths and name not in self.svgs and self.contentHash(name) not in cached:
+                self.loadSVG(name)
+
+    def contentHash(self, name: str) -> str:
+        digest = self.hashes.get(name)
+        if digest is None:
+            with open(self.paths[name], "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            self.hashes[name] = digest
+        return digest
+
+    # ---- persistent raster cache ----
+
+    def validateDiskCache(self):
+        """Index the cache directory, dropping partial and malformed files."""
+        try:
+            os.makedirs(self.cacheDir, exist_ok=True)
+            entries = list(os.scandir(self.cacheDir))
+        except OSError:
+            self.cacheDir = None
+            return
+        for entry in entries:
+            valid = entry.name.endswith(".argb")
+            if valid:
+                try:
+                    size = entry.name[:-5].split("-")[1]
+                    width, height = (int(n) for n in size.split("x"))
+                    valid = entry.stat().st_size == RASTER_HEADER.size + width * height * 4
+                except (IndexError, ValueError):
+                    valid = False
+            if valid:
+                self.diskFiles[entry.name] = [entry.stat().st_size, entry.stat().st_mtime]
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+        self.evictDiskCache()
+
+    def evictDiskCache(self):
+        total = sum(size for size, _ in self.diskFiles.values())
+        for file, (size, _) in sorted(self.diskFiles.items(), key=lambda item: item[1][1]):
+            if total <= self.cacheLimit:
+                break
+            try:
+                os.remove(os.path.join(self.cacheDir, file))
+            except OSError:
+                pass
+            del self.diskFiles[file]
+            total -= size
+
+    def diskName(self, name: str, width: int, height: int, ratio: float) -> str:
+        return f"{self.contentHash(name)}-{width}x{height}-{round(ratio * 100)}.argb"
+
+    def loadRaster(self, file: str):
+        path = os.path.join(self.cacheDir, file)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, width, height = RASTER_HEADER.unpack_from(data, 0)
+            os.utime(path)
+        except (OSError, struct.error):
+            del self.diskFiles[file]
+            return None
+        if magic != b"ARGB" or len(data) != RASTER_HEADER.size + width * height * 4:
+            del self.diskFiles[file]
+            return None
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        bits = image.bits()
+        bits.setsize(image.sizeInBytes())
+        memoryview(bits)[:] = data[RASTER_HEADER.size:]  # the image must own its pixels
+        pixmap = QPixmap.fromImage(image)
+        self.diskFiles[file][1] = time.time()
+        return pixmap
+
+    def saveRaster(self, file: str, image: QImage):
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        path = os.path.join(self.cacheDir, file)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(RASTER_HEADER.pack(b"ARGB", image.width(), image.height()))
+                f.write(bytes(bits))
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+        self.diskFiles[file] = [RASTER_HEADER.size + image.sizeInBytes(), time.time()]
+        self.evictDiskCache()
+
+    # ---- in-memory cache across sizes ----
+
+    def setDevicePixelRatio(self, ratio: float) -> bool:
+        """Render at a new pixel density from now on; True if it changed.
+        Ratios are rounded to 1/20 so a window resize does not re-render per pixel."""
+        ratio = max(round(ratio * 20) / 20, 0.05)
+        if ratio == self.devicePixelRatio:
+            return False
+        self.devicePixelRatio = ratio
+        return True
+
+    def remember(self, store: dict, key, value, size: int):
+        store[key] = value
+        self.lru[(id(store), key)] = size
+        self.memoryUsed += size
+        self.trimMemory()
+
+    def forget(self, store: dict, key):
+        if key in store:
+            del store[key]
+            self.memoryUsed -= self.lru.pop((id(store), key))
+
+    def touch(self, store: dict, key):
+        self.lru.move_to_end((id(store), key))
+        return store[key]
+
+    def trimMemory(self):
+        """Drop the least recently used pixmaps of other ratios first, then any,
+        until the budget holds. Items still showing a dropped pixmap keep it alive."""
+        stores = {id(self.cache): self.cache, id(self.atlases): self.atlases}
+        for anyRatio in (False, True):
+            for entry in list(self.lru):
+                if self.memoryUsed <= self.memoryBudget or len(self.lru) <= 1:
+                    return
+                storeId, key = entry
+                if anyRatio or key[2] != self.devicePixelRatio:
+                    stores[storeId].pop(key, None)
+                    self.memoryUsed -= self.lru.pop(entry)
+
+    def pixelSize(self, size: tuple, ratio: float=None) -> tuple:
+        ratio = self.devicePixelRatio if ratio is None else ratio
+        return round(size[0] * ratio), round(size[1] * ratio)
+
+    def cachedSVG(self, name: str, size: tuple):
+        """The pixmap from memory or the disk cache, or None if it must be rendered."""
+        ratio = self.devicePixelRatio
+        key = (name, size, ratio)
         if key in self.cache:
-            return self.cache[key]
+            return self.touch(self.cache, key)
+        if self.cacheDir:
+            file = self.diskName(name, *self.pixelSize(size), ratio)
+            if file in self.diskFiles:
+                image = self.loadRaster(file)
+                if image is not None:
+                    self.diskHits += 1
+                    image.setDevicePixelRatio(ratio)
+                    self.remember(self.cache, key, image, image.width() * image.height() * 4)
+                    return image
+        return None
+
+    def nearestSVG(self, name: str, size: tuple):
+        """The cached pixmap whose ratio is closest to the current one, if any;
+        drawn scaled it stands in while the exact size renders."""
+        keys = [key for key in self.cache if key[0] == name and key[1] == size]
+        if not keys:
+            return None
+        return self.cache[min(keys, key=lambda key: abs(key[2] - self.devicePixelRatio))]
+
+    def renderImage(self, name: str, width: int, height: int) -> QImage:
+        """Rasterize an SVG into a QImage; safe to call from worker threads."""
+        renderer = self.loadSVG(name)
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        with self.renderLock(name):
+            renderer.render(painter)
+        painter.end()
+        return image
+
+    def storeImage(self, name: str, size: tuple, image: QImage, ratio: float=None) -> QPixmap:
+        """Turn a rendered image into the cached pixmap (GUI thread only)."""
+        ratio = self.devicePixelRatio if ratio is None else ratio
+        self.diskMisses += 1
+        if self.cacheDir:
+            self.saveRaster(self.diskName(name, image.width(), image.height(), ratio), image)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(ratio)
+        self.remember(self.cache, (name, size, ratio), pixmap, image.width() * image.height() * 4)
+        return pixmap
+
+    def getSVG(self, name: str, size: tuple) -> QPixmap:
+        if name not in self.paths:
+            raise ValueError(f"SVG '{name}' not found.")
+        pixmap = self.cachedSVG(name, size)
+        if pixmap is None:
+            pixmap = self.storeImage(name, size, self.renderImage(name, *self.pixelSize(size)))
+        return pixmap
+
+    def prerender(self, names: list, size: tuple) -> PrerenderJob:
+        """Render SVGs in parallel on the global thread pool.
+
+        Cached images are served right away; check job.done before connecting
+        to job.finished, which fires once every image is ready."""
+        job = PrerenderJob(self, names, size, self.devicePixelRatio)
+        missing = []
+        for name in names:
+            pixmap = self.cachedSVG(name, size)
+            if pixmap is None:
+                missing.append(name)
+            else:
+                job.pixmaps[name] = pixmap
+                job.pending.discard(name)
+        if not missing:
+            job.done = True
+        width, height = self.pixelSize(size)
+        pool = QThreadPool.globalInstance()
+        for name in missing:
+            pool.start(RenderTask(self, job, name, width, height))
+        return job
+
+    def atlasFile(self, names: list, size: tuple, columns: int, gap: int) -> str:
+        width, height = self.pixelSize(size)
+        columns = min(columns, len(names))
+        rows = (len(names) + columns - 1) // columns
+        digest = hashlib.sha1("".join(self.contentHash(name) for name in names).encode()).hexdigest()
+        return (f"{digest}-{columns * (width + gap) - gap}x{rows * (height + gap) - gap}-"
+                f"{round(self.devicePixelRatio * 100)}.argb")
+
+    def hasAtlas(self, names: list, size: tuple, columns: int=9, gap: int=2) -> bool:
+        """Whether getAtlas can be served without rendering anything."""
+        if (tuple(names), size, self.devicePixelRatio) in self.atlases:
+            return True
+        return bool(self.cacheDir) and self.atlasFile(names, size, columns, gap) in self.diskFiles
+
+    def getAtlas(self, names: list, size: tuple, columns: int=9, gap: int=2, images: dict=None) -> dict:
+        """Render several SVGs into one sheet and return name -> Sprite.
+        images may hold already rendered pixmaps (e.g. from prerender) to copy in."""
+        ratio = self.devicePixelRatio
+        key = (tuple(names), size, ratio)
+        if key in self.atlases:
+            return self.touch(self.atlases, key)[1]
+        width, height = self.pixelSize(size)
+        columns = min(columns, len(names))
+        rows = (len(names) + columns - 1) // columns
+        sheetWidth = columns * (width + gap) - gap
+        sheetHeight = rows * (height + gap) - gap
+        places = [QRectF((i % columns) * (width + gap), (i // columns) * (height + gap), width, height)
+                  for i in range(len(names))]
+
+        file = self.atlasFile(names, size, columns, gap) if self.cacheDir else None
+        sheet = self.loadRaster(file) if file in self.diskFiles else None
+        if sheet is not None:
+            self.diskHits += 1
+        else:
+            self.diskMisses += 1
+            sheet = QPixmap(sheetWidth, sheetHeight)
+            sheet.fill(Qt.transparent)
+            painter = QPainter(sheet)
+            for name, place in zip(names, places):
+                if images is not None and name in images:
+                    painter.drawPixmap(place, images[name], QRectF(images[name].rect()))
+                    self.forget(self.cache, (name, size, ratio))  # the sheet replaces it
+                else:
+                    renderer = self.loadSVG(name)
+                    with self.renderLock(name):
+                        renderer.render(painter, place)
+            painter.end()
+            if file is not None:
+                self.saveRaster(file, sheet.toImage())
+        sheet.setDevicePixelRatio(ratio)
+        sprites = {name: Sprite(sheet, place, size) for name, place in zip(names, places)}
+        self.remember(self.atlases, key, (sheet, sprites), sheetWidth * sheetHeight * 4)
+        return sprites
+
+    def nearestAtlas(self, names: list, size: tuple):
+        """Sprites of the cached atlas whose ratio is closest to the current one."""
+        keys = [key for key in self.atlases if key[0] == tuple(names) and key[1] == size]
+        if not keys:
+            return None
+        return self.atlases[min(keys, key=lambda key: abs(key[2] - self.devicePixelRatio))][1]
 
-        if name in self.svgs:
-            image = QPixmap(size[0], size[1])
-            image.fill(Qt.transparent)
-            self.svgs[name].render(QPainter(image))
-            self.cache[key] = image
-            return image
+    def memoryReport(self) -> str:
+        """Pixel memory of each atlas against the same images as separate pixmaps."""
+        lines = []
+        for (names, size, ratio), (sheet, sprites) in self.atlases.items():
+            single = round(size[0] * ratio) * round(size[1] * ratio) * 4
+            lines.append(f"Atlas: {len(names)} sprites in 1 pixmap of {sheet.width()}x{sheet.height()} "
+                         f"({sheet.width() * sheet.height() * 4 / 1024:.0f} KB) vs {len(names)} pixmaps "
+                         f"({len(names) * single / 1024:.0f} KB)")
+        return "\n".join(lines)
 
-        raise ValueError(f"SVG '{name}' not found.")
+    def report(self) -> str:
+        return (f"SVG: {len(self.svgs)}/{len(self.paths)} files parsed, "
+                f"{self.parseTime * 1000:.1f} ms on the GUI thread, "
+                f"{self.backgroundTime * 1000:.1f} ms off it, "
+                f"{self.diskHits} rasters from disk cache, {self.diskMisses} rendered, "
+                f"{self.memoryUsed / 1024 / 1024:.1f} MB of pixmaps in memory")
 
     def shutdown(self):
+        self._stop = True
+        if self._thread is not None:
+            self._thread.join()
         self.svgs.clear()
-        self.cache.clear()
\ No newline at end of file
+        self.cache.clear()
+        self.atlases.clear()
+        self.lru.clear()
+        self.memoryUsed = 0
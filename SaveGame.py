@@ -0,0 +1,69 @@
+"""Compact binary snapshot of a game in progress, for resuming after a restart.
+
+Layout (little endian):
+    header   "SSAV", version u16, seed u64, clock seconds u32,
+             journal length u16, redo length u16
+    state    GameState.pack(): 13 pile lengths, 13 face-down counts, 52 cards,
+             draw count (version 2 on; version 1 games are draw-1)
+    journal  the move journal words, then the redo words, u16 each
+
+A game of a couple of hundred moves fits in well under 1 KB.
+"""
+import os
+import struct
+import sys
+from array import array
+from GameState import GameState, PILES
+
+HEADER = struct.Struct("<4sHQIHH")
+VERSION = 2
+STATE_SIZES = {1: 2 * PILES + 52, 2: 2 * PILES + 53}
+
+
+def saveGame(path: str, game: GameState, seed: int, seconds: int):
+    """Write the snapshot next to path and move it into place in one step."""
+    history, future = game.history[-0xFFFF:], game.future[-0xFFFF:]
+    if sys.byteorder == "big":
+        history, future = history[:], future[:]
+        history.byteswap()
+        future.byteswap()
+    data = HEADER.pack(b"SSAV", VERSION, seed, seconds, len(history), len(future))
+    data += game.pack() + history.tobytes() + future.tobytes()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+def loadGame(path: str):
+    """(game, seed, clock seconds) from a snapshot, or None if it is missing or invalid."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, seed, seconds, moves, redos = HEADER.unpack_from(data, 0)
+    except (OSError, struct.error):
+        return None
+    if magic != b"SSAV" or version not in STATE_SIZES:
+        return None
+    size = STATE_SIZES[version]
+    if len(data) != HEADER.size + size + 2 * (moves + redos):
+        return None
+    state = data[HEADER.size:HEADER.size + size]
+    if sum(state[:PILES]) != 52 or sorted(state[2 * PILES:2 * PILES + 52]) != list(range(52)):
+        return None
+    if version > 1 and not 1 <= state[-1] <= 24:
+        return None
+    if any(hidden > max(length - 1, 0) for length, hidden in zip(state[:PILES], state[PILES:2 * PILES])):
+        return None
+    game = GameState.unpack(state)
+    journal = array("H", data[HEADER.size + size:])
+    if sys.byteorder == "big":
+        journal.byteswap()
+    game.history = journal[:moves]
+    game.future = journal[moves:]
+    return game, seed, seconds
+
+def deleteSave(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
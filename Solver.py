@@ -0,0 +1,260 @@
+"""Depth-first Klondike solver working on a GameState.
+
+States are hashed Zobrist-style: one random 64-bit key per (card, pile) plus
+one for every face-down tableau card and one per waste length, xor-ed in and
+out as cards move. This is enough to identify a position because face-up
+tableau runs are ordered by rank and the stock and waste always keep the
+deal's relative order. Safe foundation moves are played without branching
+and unpromising moves are pruned, so False means no win was found in the
+pruned tree rather than a proof that the deal is lost.
+"""
+import random
+import time
+from GameState import GameState, STOCK, WASTE, FOUNDATION, TABLEAU, PILES, FLIPPED, TABLEAU_FITS, isRed
+
+HIDDEN = PILES  # zobrist slot for a face-down tableau card
+
+_rng = random.Random(0x5EED)
+ZOBRIST = [[_rng.getrandbits(64) for _ in range(PILES + 1)] for _ in range(52)]
+WASTE_KEYS = [_rng.getrandbits(64) for _ in range(53)]
+# the two cards a card can be stacked on in the tableau
+PARENTS = [[p for p in range(52) if TABLEAU_FITS[c * 53 + p]] for c in range(52)]
+
+
+def isSafe(card: int, piles) -> bool:
+    """A foundation move no other move can need to undo: nothing left can be
+    stacked on the card and nothing of its colour needs the opposite suits."""
+    value = card % 13 + 1
+    if value <= 2:
+        return True
+    red = isRed(card)
+    for suit in range(4):
+        height = len(piles[FOUNDATION + suit])
+        if suit == card // 13:
+            continue
+        if isRed(suit * 13) != red:
+            if height < value - 1:
+                return False
+        elif height < value - 2:
+            return False
+    return True
+
+
+class Solver:
+    def __init__(self, state: GameState, maxNodes: int=200000, timeLimit: float=1.0, tableSize: int=1 << 18):
+        self.state = state.copy()
+        del self.state.history[:]
+        del self.state.future[:]
+        self.maxNodes = maxNodes
+        self.timeLimit = timeLimit
+        self.tableSize = tableSize
+        self.table = set()
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.solution = []
+        self.key = self.hashState()
+
+    def hashState(self) -> int:
+        key = WASTE_KEYS[len(self.state.piles[WASTE])]
+        for pile, cards in enumerate(self.state.piles):
+            hidden = self.state.hidden[pile]
+            for pos, card in enumerate(cards):
+                key ^= ZOBRIST[card][HIDDEN if pos < hidden else pile]
+        return key
+
+    def play(self, move) -> int:
+        """Apply a move, update the state key and return the move's flags."""
+        state = self.state
+        src, dst, count = move
+        flags = state.apply(move)
+        piles = state.piles
+        delta = 0
+        if src == STOCK or dst == STOCK:
+            moved = piles[dst] if dst == STOCK else piles[WASTE][-count:]
+            for card in moved:
+                delta ^= ZOBRIST[card][STOCK] ^ ZOBRIST[card][WASTE]
+            waste = len(piles[WASTE])
+            delta ^= WASTE_KEYS[waste] ^ WASTE_KEYS[waste - count if src == STOCK else count]
+        else:
+            for card in piles[dst][-count:]:
+                delta ^= ZOBRIST[card][src] ^ ZOBRIST[card][dst]
+            if flags & FLIPPED:
+                card = piles[src][-1]
+                delta ^= ZOBRIST[card][HIDDEN] ^ ZOBRIST[card][src]
+            if src == WASTE:
+                waste = len(piles[WASTE])
+                delta ^= WASTE_KEYS[waste] ^ WASTE_KEYS[waste + 1]
+        self.key ^= delta
+        return flags
+
+    def safeMoves(self) -> int:
+        """Play every safe foundation move from the waste and tableau tops."""
+        piles = self.state.piles
+        played = 0
+        found = True
+        while found:
+            found = False
+            for src in (WASTE,) + tuple(range(TABLEAU, PILES)):
+                pile = piles[src]
+                if pile:
+                    card = pile[-1]
+                    if len(piles[FOUNDATION + card // 13]) == card % 13 and isSafe(card, piles):
+                        self.play((src, FOUNDATION + card // 13, 1))
+                        played += 1
+                        found = True
+        return played
+
+    def talonCards(self) -> list:
+        """Each card the stock and waste can bring to the top of the waste,
+        with the draws (and recycle) needed, fewest first."""
+        piles = self.state.piles
+        stock, waste = piles[STOCK], piles[WASTE]
+        drawCount = self.state.drawCount
+        talon = stock + waste[::-1]
+        total = len(talon)
+        start = len(stock)
+        cards = []
+        if waste:
+            cards.append(([], waste[-1]))
+        seen = set()
+        draws = []
+        left = start
+        recycled = False
+        while True:
+            if left:
+                count = min(drawCount, left)
+                draws.append((STOCK, WASTE, count))
+                left -= count
+            elif recycled:
+                break   # a second pass would turn up the same cards again
+            else:
+                draws.append((WASTE, STOCK, total))
+                left = total
+                recycled = True
+            if left == start:
+                break
+            if left < total and talon[left] not in seen:
+                seen.add(talon[left])
+                cards.append((draws[:], talon[left]))
+        return cards
+
+    def orderedMoves(self) -> list:
+        """Candidate moves, most promising first, with useless ones pruned."""
+        state = self.state
+        piles = state.piles
+        hidden = state.hidden
+        tops = {}
+        empty = None
+        for i in range(TABLEAU, PILES):
+            if piles[i]:
+                tops[piles[i][-1]] = i
+            elif empty is None:
+                empty = i
+        foundation, exposing, fromWaste, partial, last = [], [], [], [], []
+        # every candidate is a short list of moves: stock draws are never searched
+        # on their own but folded into the move that plays the card they uncover
+
+        for src in range(TABLEAU, PILES):
+            pile = piles[src]
+            if not pile:
+                continue
+            n = len(pile)
+            top = pile[-1]
+            if len(piles[FOUNDATION + top // 13]) == top % 13:
+                foundation.append([(src, FOUNDATION + top // 13, 1)])
+            first = hidden[src]
+            for pos in range(first, n):
+                card = pile[pos]
+                if pos == first:
+                    if first == 0 and card % 13 == 12:
+                        continue
+                    target = exposing
+                else:
+                    below = pile[pos - 1]
+                    if len(piles[FOUNDATION + below // 13]) != below % 13:
+                        continue
+                    target = partial
+                for parent in PARENTS[card]:
+                    if parent in tops:
+                        target.append([(src, tops[parent], n - pos)])
+                if card % 13 == 12 and empty is not None and pos > 0:
+                    target.append([(src, empty, n - pos)])
+
+        for draws, card in self.talonCards():
+            if len(piles[FOUNDATION + card // 13]) == card % 13:
+                foundation.append(draws + [(WASTE, FOUNDATION + card // 13, 1)])
+            for parent in PARENTS[card]:
+                if parent in tops:
+                    fromWaste.append(draws + [(WASTE, tops[parent], 1)])
+            if card % 13 == 12 and empty is not None:
+                fromWaste.append(draws + [(WASTE, empty, 1)])
+
+        for src in range(FOUNDATION, TABLEAU):
+            pile = piles[src]
+            if pile and pile[-1] % 13 > 1:
+                for parent in PARENTS[pile[-1]]:
+                    if parent in tops:
+                        last.append([(src, tops[parent], 1)])
+        return foundation + exposing + fromWaste + partial + last
+
+    def solve(self):
+        """Search for a win. Returns True, False, or None if the budget ran out.
+        On success self.solution holds the moves up to the point where every
+        card is face-up and auto-complete can finish the game."""
+        start = time.perf_counter()
+        state = self.state
+        table = self.table
+        frames = []      # [candidates, next index, moves played to reach it, key before them]
+        result = None
+
+        key = self.key
+        forced = self.safeMoves()
+        table.add(self.key)
+        if state.canAutoComplete():
+            result = True
+        else:
+            frames.append([self.orderedMoves(), 0, forced, key])
+
+        while frames:
+            frame = frames[-1]
+            candidates = frame[0]
+            if frame[1] < len(candidates):
+                moves = candidates[frame[1]]
+                frame[1] += 1
+                self.nodes += 1
+                if self.nodes & 1023 == 0:
+                    if self.nodes >= self.maxNodes or time.perf_counter() - start > self.timeLimit:
+                        break
+                key = self.key
+                for move in moves:
+                    self.play(move)
+                if self.key in table:
+                    for _ in moves:
+                        state.undo()
+                    self.key = key
+                    continue
+                forced = self.safeMoves()
+                if len(table) >= self.tableSize:
+                    table.clear()
+                table.add(self.key)
+                if state.canAutoComplete():
+                    result = True
+                    break
+                frames.append([self.orderedMoves(), 0, len(moves) + forced, key])
+            else:
+                frames.pop()
+                for _ in range(frame[2]):
+                    state.undo()
+                self.key = frame[3]
+        else:
+            if result is None:
+                result = False
+
+        self.elapsed = time.perf_counter() - start
+        if result:
+            self.solution = state.moves()
+        return result
+
+
+def isWinnable(state: GameState, maxNodes: int=200000, timeLimit: float=1.0):
+    return Solver(state, maxNodes, timeLimit).solve()
@@ -0,0 +1,106 @@
+"""Monte Carlo estimate of the chance that a position can still be won.
+
+The player cannot know the face-down tableau cards, so each sample deals
+them out again in a random order (the stock is not shuffled: it can be
+looked through by cycling it) and asks the solver whether that table is
+winnable. Samples run in batches on a process pool; start() on a new
+position cancels whatever has not started yet and ignores the rest.
+
+The solver prunes its search and stops on a time budget, so only its wins
+are proofs: a sample it gives up on is most likely a hard or lost one. The
+estimate is therefore a lower bound, proven wins over finished samples,
+and the samples it gave up on are counted as unknown.
+"""
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from GameState import GameState, TABLEAU, PILES
+from Solver import Solver
+
+SAMPLES = 48        # solver runs per position
+BATCH = 4           # samples per task
+TIME_LIMIT = 0.25   # solver seconds per sample
+
+
+def sampleHidden(state: GameState, rng) -> GameState:
+    """A copy of state with its face-down tableau cards dealt in a random order."""
+    sample = state.copy()
+    hidden = [card for pile in range(TABLEAU, PILES) for card in sample.piles[pile][:sample.hidden[pile]]]
+    rng.shuffle(hidden)
+    n = 0
+    for pile in range(TABLEAU, PILES):
+        count = sample.hidden[pile]
+        sample.piles[pile][:count] = hidden[n:n + count]
+        n += count
+    sample.reindex()
+    return sample
+
+def rolloutBatch(packed: bytes, seeds: list, timeLimit: float) -> list:
+    """Solver results (True/False/None) for one sample per seed."""
+    state = GameState.unpack(packed)
+    return [Solver(sampleHidden(state, random.Random(seed)), timeLimit=timeLimit).solve() for seed in seeds]
+
+
+class WinEstimator:
+    def __init__(self, workers: int=None, samples: int=SAMPLES, timeLimit: float=TIME_LIMIT):
+        self.workers = workers or os.cpu_count() or 1
+        self.samples = samples
+        self.timeLimit = timeLimit
+        self.pool = None
+        self.pending = []
+        self.wins = 0
+        self.unknown = 0    # samples the solver ran out of time on
+        self.done = 0
+        self.total = 0
+
+    def start(self, state: GameState):
+        """Estimate state from scratch, dropping the work for the previous position."""
+        self.cancel()
+        if self.pool is None:
+            # spawn, not fork: the GUI process has Qt threads running
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        samples = self.samples if state.faceDown else 1
+        packed = state.pack()
+        seeds = [random.getrandbits(32) for _ in range(samples)]
+        self.total = samples
+        try:
+            self.pending = [self.pool.submit(rolloutBatch, packed, seeds[i:i + BATCH], self.timeLimit)
+                            for i in range(0, samples, BATCH)]
+        except BrokenProcessPool:
+            self.shutdown()     # a worker died; the next start gets a fresh pool
+
+    def poll(self) -> bool:
+        """Collect finished batches; True if the estimate changed."""
+        changed = False
+        for future in [future for future in self.pending if future.done()]:
+            self.pending.remove(future)
+            if future.cancelled() or future.exception() is not None:
+                continue
+            results = future.result()
+            self.wins += results.count(True)
+            self.unknown += results.count(None)
+            self.done += len(results)
+            changed = True
+        return changed
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending
+
+    def lowerBound(self):
+        """Share of the finished samples proven winnable, or None before any finished."""
+        return self.wins / self.done if self.done else None
+
+    def cancel(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.wins = self.unknown = self.done = self.total = 0
+
+    def shutdown(self):
+        self.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,145 @@
+"""Solve a range of seeded deals in parallel and stream the results.
+
+    python analyze.py 1 1000000 -o results.csv --workers 8 --time-limit 1
+
+Each seed is dealt exactly like MainWindow.ShuffleCards deals it. Results
+are appended to a .csv or .jsonl file as they arrive, so an interrupted run
+resumes where it stopped when started again with the same output file.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from GameState import GameState, shuffledDeck
+from Solver import Solver
+
+FIELDS = ["seed", "winnable", "moves", "nodes", "seconds"]
+BATCH = 32  # seeds per task, keeps inter-process traffic low
+
+
+def solveSeed(seed: int, timeLimit: float, maxNodes: int) -> dict:
+    state = GameState()
+    state.deal(shuffledDeck(seed))
+    solver = Solver(state, maxNodes=maxNodes, timeLimit=timeLimit)
+    result = solver.solve()
+    return {"seed": seed,
+            "winnable": "unknown" if result is None else ("yes" if result else "no"),
+            "moves": len(solver.solution),
+            "nodes": solver.nodes,
+            "seconds": round(solver.elapsed, 4)}
+
+def solveBatch(seeds: list, timeLimit: float, maxNodes: int) -> list:
+    return [solveSeed(seed, timeLimit, maxNodes) for seed in seeds]
+
+
+def doneSeeds(path: str) -> set:
+    """Seeds already present in an output file from an earlier run."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                try:
+                    done.add(int(json.loads(line)["seed"]))
+                except (ValueError, KeyError):
+                    pass  # a line cut short by the interruption
+        else:
+            for row in csv.DictReader(f):
+                if row.get("seconds"):
+                    done.add(int(row["seed"]))
+    return done
+
+
+class ResultWriter:
+    def __init__(self, path: str):
+        self.jsonl = path.endswith(".jsonl")
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", encoding="utf-8", newline="")
+        if not fresh:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")  # finish a line cut short by the interruption
+        if not self.jsonl:
+            self.csv = csv.DictWriter(self.file, FIELDS)
+            if fresh:
+                self.csv.writeheader()
+
+    def write(self, rows: list):
+        for row in rows:
+            if self.jsonl:
+                self.file.write(json.dumps(row) + "\n")
+            else:
+                self.csv.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-solve seeded Klondike deals.")
+    parser.add_argument("first", type=int, help="first seed")
+    parser.add_argument("last", type=int, help="last seed (inclusive)")
+    parser.add_argument("-o", "--output", default="results.csv", help="results file, .csv or .jsonl")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("-t", "--time-limit", type=float, default=1.0, help="seconds per deal")
+    parser.add_argument("-n", "--max-nodes", type=int, default=1000000, help="search nodes per deal")
+    args = parser.parse_args(argv)
+
+    done = doneSeeds(args.output)
+    seeds = [seed for seed in range(args.first, args.last + 1) if seed not in done]
+    if done:
+        print(f"Resuming: {len(done)} seeds already in {args.output}, {len(seeds)} to go.")
+    batches = [seeds[i:i + BATCH] for i in range(0, len(seeds), BATCH)]
+
+    writer = ResultWriter(args.output)
+    counts = {"yes": 0, "no": 0, "unknown": 0}
+    start = time.perf_counter()
+    report = start
+    solved = 0
+    with ProcessPoolExecutor(args.workers) as pool:
+        pending = set()
+        queued = iter(batches)
+        try:
+            while True:
+                # keep a few batches per worker in flight instead of queueing them all
+                while len(pending) < args.workers * 4:
+                    batch = next(queued, None)
+                    if batch is None:
+                        break
+                    pending.add(pool.submit(solveBatch, batch, args.time_limit, args.max_nodes))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    rows = future.result()
+                    writer.write(rows)
+                    for row in rows:
+                        counts[row["winnable"]] += 1
+                    solved += len(rows)
+                now = time.perf_counter()
+                if now - report >= 5:
+                    report = now
+                    print(f"{solved}/{len(seeds)} deals, {solved / (now - start):.1f} deals/sec", file=sys.stderr)
+        except KeyboardInterrupt:
+            for future in pending:
+                future.cancel()
+            print("Interrupted; run again with the same output file to resume.", file=sys.stderr)
+        finally:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = solved / elapsed if elapsed > 0 else 0.0
+    print(f"{solved} deals in {elapsed:.1f}s: {rate:.1f} deals/sec with {args.workers} workers")
+    if solved:
+        print(f"winnable {counts['yes']}, not found {counts['no']}, unknown {counts['unknown']} "
+              f"({100 * counts['yes'] / solved:.1f}% proven winnable)")
+
+
+if __name__ == "__main__":
+    main()
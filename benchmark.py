@@ -0,0 +1,281 @@
+"""Offscreen benchmarks of the game window.
+
+    python benchmark.py -o bench.json                     # run and save the results
+    python benchmark.py --baseline bench.json             # fail on a regression against them
+    python benchmark.py --cold                            # start with an empty raster cache
+    python benchmark.py --runs 5                          # best of five runs per metric
+    python benchmark.py --profile plain                   # with another render profile
+
+Runs MainWindow on the offscreen Qt platform and measures, in milliseconds
+unless noted: process start to first paint, dealing a game until its
+animation settles and the viewport paint time spent on it, a full repaint,
+synthetic drags through the Card mouse handlers, a full
+auto-complete at the configured speed, and the peak resident set size.
+Lower is better for every metric; --threshold sets how much worse than
+the baseline a metric may get.
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+DEALS = 10
+DRAGS = 20
+DRAG_STEPS = 60
+PAINTS = 60
+SEED = 1234
+
+
+def peakRss():
+    """Peak resident set size in MB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def benchWindow(folder: str, cacheDir: str=None, profile: str=None):
+    """A MainWindow subclass that keeps its save, replay and (optionally) raster
+    cache in folder instead of the user's, and never resumes a saved game."""
+    import main
+    import SVGManager
+
+    class BenchWindow(main.MainWindow):
+        def initUI(self):
+            super().initUI()
+            self.savePath = os.path.join(folder, "game.sav")
+            self.replayPath = os.path.join(folder, "game.rpl")
+
+    main.WIN_ESTIMATE = False   # its worker processes would compete with the measurement
+    if profile is not None:
+        main.RENDER_PROFILE = profile
+    main.SVGManager = SVGManager.SVGManager if cacheDir is None else functools.partial(SVGManager.SVGManager, cacheDir=cacheDir)
+    return BenchWindow
+
+
+def startupChild(started: float, cold: bool, profile: str=None):
+    """Runs in a fresh process: report the startup milestones as JSON."""
+    imported = time.time()
+    from PyQt5.QtCore import QEvent, QObject, QThreadPool
+    from PyQt5.QtWidgets import QApplication
+    folder = tempfile.mkdtemp()
+    Window = benchWindow(folder, os.path.join(folder, "raster") if cold else None, profile)
+    app = QApplication(sys.argv[:1])
+    times = {}
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and "paint" not in times:
+                times["paint"] = time.time()
+                app.quit()
+            return False
+
+    begin = time.time()
+    window = Window(SEED)
+    times["window"] = time.time()
+    watcher = FirstPaint()
+    window.viewport().installEventFilter(watcher)
+    window.show()
+    app.exec_()
+    QThreadPool.globalInstance().waitForDone()  # rasters still rendering for a cold cache
+    window.replay.close()
+    shutil.rmtree(folder, ignore_errors=True)
+    print(json.dumps({"startup_imports": (imported - started) * 1000,
+                      "startup_window": (times["window"] - begin) * 1000,
+                      "startup_first_paint": (times["paint"] - started) * 1000}))
+
+
+def settle(app, window, timeout: float=5.0):
+    """Process events until no card animation is running."""
+    deadline = time.perf_counter() + timeout
+    app.processEvents()
+    while window.animator.liveCount and time.perf_counter() < deadline:
+        time.sleep(0.001)
+        app.processEvents()
+
+
+class MouseEvent:
+    """Stands in for QGraphicsSceneMouseEvent, which PyQt cannot construct."""
+    def __init__(self, pos):
+        self.pos = pos
+
+    def scenePos(self):
+        return self.pos
+
+    def button(self):
+        from PyQt5.QtCore import Qt
+        return Qt.LeftButton
+
+
+def dragCard(app, window, card, offsets) -> list:
+    """Press on card, move it along offsets (scene units) and drop it where it
+    started; returns the time each move took as a frame of its own: the event,
+    the drag update its frame timer would run, and a repaint."""
+    start = card.sceneBoundingRect().center()
+    card.mousePressEvent(MouseEvent(start))
+    costs = []
+    for offset in offsets:
+        begin = time.perf_counter()
+        card.mouseMoveEvent(MouseEvent(start + offset))
+        card.flushDrag()
+        window.viewport().repaint()
+        costs.append(time.perf_counter() - begin)
+        app.processEvents()
+    card.mouseReleaseEvent(MouseEvent(start))
+    return costs
+
+
+def benchGame(cold: bool, profile: str=None) -> dict:
+    import math
+    from PyQt5.QtCore import QPointF
+    from PyQt5.QtWidgets import QApplication
+    from Solver import Solver
+    results = {}
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    folder = tempfile.mkdtemp()
+    window = benchWindow(folder, os.path.join(folder, "raster") if cold else None, profile)(SEED)
+    window.show()
+    settle(app, window)
+
+    begin = time.perf_counter()
+    for seed in range(SEED, SEED + DEALS):
+        window.ShuffleCards(seed)
+    results["shuffle"] = (time.perf_counter() - begin) * 1000 / DEALS
+    settle(app, window)
+    profiler = window.profiler
+    profiler.enable()
+    first = profiler.count
+    begin = time.perf_counter()
+    window.ShuffleCards(SEED + DEALS)
+    settle(app, window)
+    results["deal_animation"] = (time.perf_counter() - begin) * 1000
+    results["deal_paint"] = sum(profiler.paint[n % profiler.size] for n in range(first, profiler.count))
+    first = profiler.count
+    for _ in range(PAINTS):
+        window.viewport().repaint()
+    paints = sorted(profiler.paint[n % profiler.size] for n in range(first, profiler.count))
+    results["paint_full"] = paints[len(paints) // 2]
+    profiler.disable()
+
+    columns = [column[-1] for column in window.Tableau.cards if column]
+    offsets = [QPointF(80 * math.cos(i / DRAG_STEPS * 2 * math.pi), 60 * math.sin(i / DRAG_STEPS * 2 * math.pi))
+               for i in range(1, DRAG_STEPS + 1)]
+    costs = []
+    elapsed = 0
+    for i in range(DRAGS):
+        begin = time.perf_counter()
+        costs += dragCard(app, window, columns[i % len(columns)], offsets)
+        elapsed += time.perf_counter() - begin
+        settle(app, window)
+    results["drag"] = elapsed * 1000 / DRAGS
+    costs.sort()
+    results["drag_frame_p50"] = costs[len(costs) // 2] * 1000
+    results["drag_frame_p95"] = costs[int(len(costs) * 0.95)] * 1000
+
+    for seed in range(SEED, SEED + 1000):
+        window.ShuffleCards(seed)
+        solver = Solver(window.game, timeLimit=1.0)
+        if solver.solve():
+            break
+    for move in solver.solution:
+        if window.game.canAutoComplete():
+            break
+        window.applyMove(move)
+    played = len(window.game.history)
+    window.CheckAutoComplete()
+    settle(app, window)
+    begin = time.perf_counter()
+    window.AutoComplete()
+    while window.autoTimer.isActive():
+        time.sleep(0.001)
+        app.processEvents()
+    settle(app, window)
+    results["autocomplete"] = (time.perf_counter() - begin) * 1000
+    results["autocomplete_cards"] = len(window.game.history) - played
+    window.WinWindow.hide()
+    window.close()
+    shutil.rmtree(folder, ignore_errors=True)
+    results["peak_rss_mb"] = peakRss()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, minDelta: float) -> list:
+    """Lines describing each metric against the baseline; regressions, worse by
+    more than both threshold and minDelta, are marked."""
+    lines = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+            continue
+        change = value / old - 1
+        mark = "  REGRESSION" if change > threshold and value - old > minDelta and not name.endswith("_cards") else ""
+        lines.append(f"{name:22} {old:10.2f} -> {value:10.2f}  {change:+7.1%}{mark}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game window offscreen.")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="JSON results to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    parser.add_argument("--min-delta", type=float, default=1.0, help="ignore slowdowns smaller than this (ms or MB)")
+    parser.add_argument("-r", "--runs", type=int, default=3, help="keep the best of this many runs")
+    parser.add_argument("--cold", action="store_true", help="start without the raster disk cache")
+    parser.add_argument("-p", "--profile", help="render profile to run with, see main.RENDER_PROFILES")
+    parser.add_argument("--startup-child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_child is not None:
+        startupChild(args.startup_child, args.cold, args.profile)
+        return 0
+
+    runs = []
+    for _ in range(args.runs):
+        command = [sys.executable, os.path.abspath(__file__), "--startup-child", repr(time.time())]
+        command += ["--cold"] if args.cold else []
+        command += ["--profile", args.profile] if args.profile else []
+        child = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+        lines = [line for line in child.stdout.splitlines() if line.startswith("{")]
+        if child.returncode or not lines:
+            print(child.stdout + child.stderr)
+            return 1
+        run = json.loads(lines[-1])
+        with contextlib.redirect_stdout(io.StringIO()):     # the game's own chatter
+            run.update(benchGame(args.cold, args.profile))
+        runs.append(run)
+    # the fastest run is the one least disturbed by the rest of the machine
+    results = {name: min((run[name] for run in runs), key=lambda value: (value is None, value))
+               for name in runs[0]}
+
+    for name, value in results.items():
+        print(f"{name:22} {value:10.2f}" if value is not None else f"{name:22} {'n/a':>10}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            lines = compare(results, json.load(f), args.threshold, args.min_delta)
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,175 @@
+import time
+BOOT_START = time.perf_counter()
 from PyQt5.QtWidgets import (QWidget, QApplication, QLabel, QGraphicsView, QGraphicsScene, \
-                            QGraphicsRectItem, QGraphicsPixmapItem, QPushButton, QGraphicsTextItem)
+                            QGraphicsRectItem, QGraphicsPixmapItem, QGraphicsItem, QPushButton, QGraphicsTextItem, QShortcut)
 from PyQt5.QtGui import (QPainter, QColor, QPen, QFont, QPixmap, QFontMetrics, QIcon, \
-                        QTextOption, QPainterPath, QBrush)
-from PyQt5.QtCore import (Qt, QPointF, QPoint, QObject, QTimer, QTime, QPropertyAnimation, \
-                        QEasingCurve, QEventLoop, pyqtProperty)
-from screeninfo import get_monitors
+                        QTextOption, QPainterPath, QBrush, QTransform, QKeySequence, QImageReader)
+from PyQt5.QtCore import (Qt, QPointF, QPoint, QRect, QRectF, QTimer, QTime, QElapsedTimer, QStandardPaths, \
+                          QObject, QEvent, QThreadPool)
 import sys
 import math
 import os
 import random
-from SVGManager import SVGManager
+from SVGManager import SVGManager, Sprite
+from DealLibrary import DealLibrary
+from SaveGame import saveGame, loadGame, deleteSave
+from ReplayFile import ReplayWriter, UNDO, REDO
+from FrameProfiler import FrameProfiler
+from GameState import (GameState, STOCK, WASTE, FOUNDATION, TABLEAU, PILES, FLIPPED, \
+                       SUITS, RANKS, cardCode, cardName, shuffledDeck)
 
 """
 To Do List:
 - Sound effects
 - scoring
-- undo/redo
 """
 
 
 C_WIDTH = 25 * 6
 C_HEIGHT = 35 * 6
 PAD = 30
+VET_TIME = 0.2      # solver budget per shuffle in winnable-only mode, see DealVetter.py
+CARD_ATLAS = True   # draw cards from one shared sprite sheet instead of 54 pixmaps
+DEAL_LIBRARY = "deals.lib"  # pre-vetted deals, see DealLibrary.py
+DEAL_DIFFICULTY = None      # 0 (easy) .. 3 (expert) from the library, None for any
+DRAW_COUNTS = (1, 3)    # the draw modes the Draw button cycles through
+WASTE_FAN = 3           # waste cards shown fanned out; the rest are hidden beneath
+FRAME_MS = 16       # drags and animations update the scene at most once per display frame
+SAVE_FILE = "game.sav"  # the game in progress, kept in the user's data folder
+REPLAY_FILE = "last-game.rpl"  # every move of the current deal, see replay.py
+HINT_BUDGET_MS = 50    # the hint shown is the best found within this time
+HINT_SHOW_MS = 2000
+WIN_ESTIMATE = False    # show a Monte Carlo estimate of the chance to win next to the clock
+TRACE_FILE = "frame-trace.json"   # F12 shows the frame profiler, Shift+F12 dumps its frames here
+BOOT_TRACE = bool(os.environ.get("SOLITAIRE_BOOT_TRACE"))  # print startup phase timings and SVG cache stats
+AUTO_COMPLETE_MS = 50  # ms between cards during auto-complete, 0 finishes instantly
+# how the view paints; "plain" is Qt's defaults, to compare against
+RENDER_PROFILES = {
+    "plain": {"antialias": True, "cacheBackground": False, "update": QGraphicsView.MinimalViewportUpdate,
+              "cacheItems": False},
+    "fast": {"antialias": False, "cacheBackground": True, "update": QGraphicsView.BoundingRectViewportUpdate,
+             "cacheItems": True},
+}
+RENDER_PROFILE = "fast"
+RESCALE_DELAY = 150  # ms after the last resize before cards re-render at the new size
+
+
+class Animator:
+    """Moves items towards their targets from one frame timer. Each active
+    tween is (start, end, start time, duration); a tick advances all of them
+    with an out-cubic ease and drops the finished ones."""
+    def __init__(self, parent):
+        self.tweens = {}    # item -> tween
+        self.clock = QElapsedTimer()
+        self.clock.start()
+        self.timer = QTimer(parent)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+
+    @property
+    def liveCount(self) -> int:
+        return len(self.tweens)
+
+    def move(self, item, end: QPointF, duration: int):
+        tween = self.tweens.get(item)
+        if duration <= 0 or (tween is None and item.pos() == end):
+            self.tweens.pop(item, None)
+            item.setPos(end)
+            return
+        if tween is not None and tween[1] == end:
+            return
+        self.tweens[item] = (item.pos(), end, self.clock.elapsed(), duration)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def stop(self, item):
+        self.tweens.pop(item, None)
+
+    def tick(self):
+        now = self.clock.elapsed()
+        finished = []
+        for item, (start, end, t0, duration) in self.tweens.items():
+            t = (now - t0) / duration
+            if t >= 1:
+                item.setPos(end)
+                finished.append(item)
+            else:
+                item.setPos(start + (end - start) * (1 - (1 - t) ** 3))
+        for item in finished:
+            del self.tweens[item]
+        if not self.tweens:
+            self.timer.stop()
+
+class SpriteItem(QGraphicsPixmapItem):
+    """A pixmap item that can also draw its image from a shared sprite sheet."""
+    sprite = None
+
+    def setImage(self, image):
+        if isinstance(image, Sprite):
+            if image is self.sprite:
+                return
+            if self.sprite is None or self.sprite.size != image.size:
+                self.prepareGeometryChange()
+            self.sprite = image
+            self.update()
+        else:
+            if self.sprite is None and image.cacheKey() == self.pixmap().cacheKey():
+                return
+            self.sprite = None
+            self.setPixmap(image)
+
+    def boundingRect(self):
+        if self.sprite is None:
+            return super().boundingRect()
+        return QRectF(0, 0, self.sprite.size[0], self.sprite.size[1])
+
+    def shape(self):
+        if self.sprite is None:
+            return super().shape()
+        path = QPainterPath()
+        path.addRect(self.boundingRect())
+        return path
 
+    def paint(self, painter, option, widget=None):
+        if self.sprite is None:
+            return super().paint(painter, option, widget)
+        self.drawImage(painter)
+
+    def drawImage(self, painter):
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+        if self.sprite is None:
+            pixmap = self.pixmap()
+            painter.drawPixmap(self.boundingRect(), pixmap, QRectF(pixmap.rect()))
+        else:
+            painter.drawPixmap(self.boundingRect(), self.sprite.sheet, self.sprite.source)
 
-class ItemAnimator(QObject):
-    """A QObject that exposes a QGraphicsItem's position as an animatable property."""
-    def __init__(self, item):
-        super().__init__()
-        self.item = item
-
-    def getPos(self):
-        return self.item.pos()
-
-    def setPos(self, pos):
-        self.item.setPos(pos)
-
-    pos = pyqtProperty(QPointF, fget=getPos, fset=setPos)
 
-class Card(QGraphicsPixmapItem):
+class DragItem(QGraphicsPixmapItem):
+    """A dragged run of cards flattened into one cached pixmap, so a drag
+    frame moves a single item instead of every card of the run."""
+    def __init__(self, cards: list, ratio: float):
+        super().__init__()
+        rect = QRectF()
+        for card in cards:
+            rect = rect.united(card.sceneBoundingRect())
+        pixmap = QPixmap(math.ceil(rect.width() * ratio), math.ceil(rect.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        for card in cards:
+            painter.save()
+            painter.translate(card.pos() - rect.topLeft())
+            card.drawImage(painter)
+            painter.restore()
+        painter.end()
+        self.setPixmap(pixmap)
+        self.setPos(rect.topLeft())
+        self.setZValue(1000)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+
+class Card(SpriteItem):
     def __init__(self, value: int, symbol: str, image: QPixmap, backside: QPixmap, parent=None):
         super().__init__()
 
@@ -46,6 +177,7 @@ class Card(QGraphicsPixmapItem):
         self.backside = backside
         self.value = value
         self.symbol = symbol
+        self.code = cardCode(value, SUITS.index(symbol))
         self.parent = parent
 
         self.Z_Value = 0
@@ -58,9 +190,10 @@ class Card(QGraphicsPixmapItem):
         self._dragging = False
         self.Drag = False
         self._last_scene_pos = QPointF()
+        self._pending_pos = None
+        self._drag_item = None
         self.start_pos = QPointF()
         self.drag_threshold = 20  # Minimum distance in pixels to start a drag
-        self._animation = None
 
         self.updateState()
         self.setPos(self.position)
@@ -68,10 +201,10 @@ class Card(QGraphicsPixmapItem):
 
     def updateState(self):
         if self.State == "faceup":
-            self.setPixmap(self.image)
+            self.setImage(self.image)
             self._drag_enabled = True
         else:
-            self.setPixmap(self.backside)
+            self.setImage(self.backside)
             self._drag_enabled = False
 
     def validMove(self, destination=None) -> bool:
@@ -83,28 +216,7 @@ class Card(QGraphicsPixmapItem):
 
     def updatePlace(self, duration=300):
         """Smoothly move the card to its target position."""
-        if duration <= 0:
-            self.setPos(self.position)
-            self.setZValue(self.Z_Value)
-            return
-
-        # Create or reuse the animator
-        if not hasattr(self, "_animator"):
-            self._animator = ItemAnimator(self)
-
-        # Stop any old animation
-        if hasattr(self, "_animation") and self._animation is not None:
-            self._animation.stop()
-
-        # Animate via the QObject wrapper
-        anim = QPropertyAnimation(self._animator, b'pos')
-        anim.setDuration(duration)
-        anim.setStartValue(self.pos())
-        anim.setEndValue(self.position)
-        anim.setEasingCurve(QEasingCurve.OutCubic)
-        anim.start()
-
-        self._animation = anim
+        self.parent.animator.move(self, self.position, duration)
         self.setZValue(self.Z_Value)
 
     def setDragEnabled(self, draggable: bool):
@@ -113,22 +225,18 @@ class Card(QGraphicsPixmapItem):
     def mousePressEvent(self, event):
         if event.button() != Qt.LeftButton:
             return
+        self.parent.CancelAutoComplete()
         self._dragging = getattr(self, "_drag_enabled", True)
         if self._dragging:
             self.Drag = False
             self._last_scene_pos = event.scenePos()
             self.start_pos = event.scenePos()
             self.grabMouse()
-            self.Stacklist = []
             if isinstance(self.container, Tableau):
-                for c in self.container.cards[self.Index][::-1]:
-                    if c == self:
-                        break
-                    self.Stacklist.append(c)
-            self.Stacklist.append(self)
-            self.Stacklist = self.Stacklist[::-1]
-            for c in self.Stacklist:
-                c.setZValue(100 + c.Z_Value)
+                column = self.container.cards[self.Index]
+                self.Stacklist = column[self.parent.game.cardPos[self.code]:]
+            else:
+                self.Stacklist = [self]
         else:
             pass
 
@@ -136,10 +244,37 @@ class Card(QGraphicsPixmapItem):
         if self._dragging:
             if (event.scenePos() - self.start_pos).manhattanLength() > self.drag_threshold:
                 self.Drag = True
-            new_scene_pos = event.scenePos()
-            delta = new_scene_pos - self._last_scene_pos
-            self.moveStack(delta)
-            self._last_scene_pos = new_scene_pos
+            if self._pending_pos is None:
+                QTimer.singleShot(FRAME_MS, self.flushDrag)
+            self._pending_pos = event.scenePos()
+
+    def flushDrag(self):
+        """Apply the mouse moves collected since the last frame in one step."""
+        if self._pending_pos is None:
+            return
+        if self._drag_item is None:
+            self._drag_item = DragItem(self.Stacklist, self.parent.svg.devicePixelRatio)
+            self.scene().addItem(self._drag_item)
+            for c in self.Stacklist:
+                self.parent.animator.stop(c)
+                c.setOpacity(0)  # hiding would release the mouse grab
+        delta = self._pending_pos - self._last_scene_pos
+        self._drag_item.moveBy(delta.x(), delta.y())
+        self._last_scene_pos = self._pending_pos
+        self._pending_pos = None
+        self.parent.hoverDrop(self, self._last_scene_pos)
+
+    def dropStack(self):
+        """Put the cards where the drag item ended up and remove it."""
+        self.flushDrag()
+        if self._drag_item is None:
+            return
+        self.moveStack(self._last_scene_pos - self.start_pos)
+        for c in self.Stacklist:
+            c.setOpacity(1)
+        self.scene().removeItem(self._drag_item)
+        self._drag_item = None
+        self.parent.hoverDrop(self, None)
 
     def moveStack(self, delta: QPointF):
         for c in self.Stacklist:
@@ -149,6 +284,7 @@ class Card(QGraphicsPixmapItem):
         if event.button() != Qt.LeftButton:
             return
         destination_card = None
+        self.dropStack()
         if self.Drag:
             mousepos = event.scenePos()
             destination_card = self.parent.releaseCard(self, mousepos)
@@ -175,6 +311,8 @@ class Card(QGraphicsPixmapItem):
 
 
 class CardContainer:
+    pile = STOCK
+
     def __init__(self, startPos: QPointF, parent):
         self.startpos = startPos
         self.x_offset = 0
@@ -189,14 +327,29 @@ class CardContainer:
         card.position = self.cardPosition(index)
         card.container = self
         card.Index = index
+        card.show()
         card.updatePlace()
         card.updateState()
 
     def removeCard(self, card: Card):
-        index = card.Index
-        if card in self.cards[index]:
-            self.cards[index].remove(card)
+        cards = self.cards[card.Index]
+        if cards and cards[-1] is card:
+            cards.pop()
+        else:
+            cards.remove(card)
+        card.container = None
+
+    def takeCards(self, index: int, count: int) -> list:
+        """Remove and return the top count cards of a pile."""
+        cards = self.cards[index]
+        taken = cards[-count:]
+        del cards[-count:]
+        for card in taken:
             card.container = None
+        return taken
+
+    def pileOf(self, card: Card) -> int:
+        return self.pile + card.Index
 
     def cardPosition(self, index: int=0) -> QPointF:
         x = self.startpos.x() + index * self.x_offset
@@ -218,6 +371,8 @@ class CardContainer:
         self.cards = [[]]
 
 class Foundation(CardContainer):
+    pile = FOUNDATION
+
     def __init__(self, startPos: QPointF, parent):
         super().__init__(startPos, parent)
         self.x_offset = C_WIDTH + 10
@@ -226,14 +381,14 @@ class Foundation(CardContainer):
         self.bgCards()
         
     def bgCards(self):
-        imageAS = self.parent.svg.getSVG("AS", (C_WIDTH, C_HEIGHT))
-        imageAH = self.parent.svg.getSVG("AH", (C_WIDTH, C_HEIGHT))
-        imageAD = self.parent.svg.getSVG("AD", (C_WIDTH, C_HEIGHT))
-        imageAC = self.parent.svg.getSVG("AC", (C_WIDTH, C_HEIGHT))
+        imageAS = self.parent.cardImage("AS")
+        imageAH = self.parent.cardImage("AH")
+        imageAD = self.parent.cardImage("AD")
+        imageAC = self.parent.cardImage("AC")
         imagelist = [imageAS, imageAH, imageAD, imageAC]
         for i, image in enumerate(imagelist):
-            bgcard = QGraphicsPixmapItem()
-            bgcard.setPixmap(image)
+            bgcard = SpriteItem()
+            bgcard.setImage(image)
             bgcard.setPos(self.startpos.x() + i * self.x_offset, self.startpos.y())
             bgcard.setOpacity(0.5)
             self.parent.foundationcards.append(bgcard)
@@ -243,6 +398,8 @@ class Foundation(CardContainer):
         self.cards = [[] for _ in range(4)]
 
 class Tableau(CardContainer):
+    pile = TABLEAU
+
     def __init__(self, startPos: QPointF, parent):
         super().__init__(startPos, parent)
         self.x_offset = C_WIDTH + 10
@@ -253,24 +410,13 @@ class Tableau(CardContainer):
         if card.State == "facedown":
             return False
         return super().validateMove(card, destination)
-    
-    def removeCard(self, card: Card):
-        index = card.Index
-        if card in self.cards[index]:
-            self.cards[index].remove(card)
-            card.container = None
-        else:
-            Warning.print(card.__repr__(), "not in", self.cards[index])
-
-
-        if self.cards[index]:
-            self.cards[index][-1].State = "faceup"
-            self.cards[index][-1].updateState()
 
     def reset(self):
         self.cards = [[] for _ in range(7)]
 
 class Stock(CardContainer):
+    pile = STOCK
+
     def __init__(self, startPos: QPointF, parent):
         super().__init__(startPos, parent)
         self.x_offset = 0
@@ -278,38 +424,70 @@ class Stock(CardContainer):
         self.reloadCard()
         
     def reloadCard(self):
-        imageReload = self.parent.svg.getSVG("reloadCard", (C_WIDTH, C_HEIGHT))
-        bgcard = QGraphicsPixmapItem()
-        bgcard.setPixmap(imageReload)
+        imageReload = self.parent.cardImage("reloadCard")
+        bgcard = SpriteItem()
+        bgcard.setImage(imageReload)
         bgcard.setPos(self.startpos.x(), self.startpos.y())
         bgcard.setOpacity(0.7)
         bgcard.mousePressEvent = self.reload
         self.parent.scene.addItem(bgcard)
+        self.reloadItem = bgcard
 
     def reload(self, event):
-        while self.parent.Waste.cards[0]:
-            card = self.parent.Waste.cards[0].pop()
-            self.addCard(card, faceup=False)
+        self.parent.applyMove((WASTE, STOCK, len(self.parent.Waste.cards[0])))
+
+    def recycle(self, waste: "Waste"):
+        """Turn the whole waste over onto the stock in one step, without animation."""
+        cards = waste.cards[0][::-1]
+        waste.reset()
+        self.cards[0] = cards
+        position = self.cardPosition(0)
+        for z, card in enumerate(cards, 1):
+            card.container = self
+            card.Index = 0
+            card.Z_Value = z
+            card.State = "facedown"
+            card.position = position
+            card.show()
+            card.updatePlace(0)
+            card.updateState()
 
     def validateMove(self, card, destination=None):
-        self.cards[0].remove(card)
-        self.parent.Waste.addCard(card)
-        self.parent.Waste.updateOrder()
-        return True
+        return self.parent.applyMove((STOCK, WASTE, self.parent.game.drawSize()))
 
 class Waste(CardContainer):
+    pile = WASTE
+
     def __init__(self, startPos: QPointF, parent):
         super().__init__(startPos, parent)
         self.x_offset = -(C_WIDTH / 4)
         self.y_offset = 0
         self.cards = [[]]
-
-    def updateOrder(self):
-        for i, card in enumerate(self.cards[0][::-1]):
-            card.Z_Value = len(self.cards[0]) - i
-            card.position = self.cardPosition(min(i, 2))
-            card._drag_enabled = False if i != 0 else True
+        self.shown = []     # the cards laid out by the last updateOrder, top last
+
+    def updateOrder(self, full: bool=False):
+        """Fan out the top WASTE_FAN cards. The cards a draw pushes out of the
+        fan slide under its last slot and stay visible until the next layout,
+        which hides them where they lie; everything deeper is hidden and not
+        painted. Only the cards whose place changed are touched, unless full
+        is set after the whole pile was rebuilt."""
+        cards = self.cards[0]
+        keep = cards[-(WASTE_FAN + self.parent.game.drawCount):]
+        parked = cards[:len(cards) - len(keep)] if full else \
+            [card for card in self.shown if card.container is self and card not in keep]
+        last = self.cardPosition(WASTE_FAN - 1)
+        for card in parked:
+            card.hide()
+            card.position = last
+            card._drag_enabled = False
+            card.updatePlace(0)
+        for depth, card in enumerate(reversed(keep)):
+            card.Z_Value = len(cards) - depth
+            card.position = self.cardPosition(min(depth, WASTE_FAN - 1))
+            card._drag_enabled = depth == 0
+            card.show()
             card.updatePlace()
+        self.shown = keep
 
     def cardPosition(self, index: int=0) -> QPointF:
         x = self.startpos.x() + index * self.x_offset
@@ -322,6 +500,7 @@ class Waste(CardContainer):
 
     def reset(self):
         self.cards = [[]]
+        self.shown = []
 
 
 class WinScreen(QWidget):    
@@ -331,8 +510,8 @@ class WinScreen(QWidget):
         self.WinWidth = 400
         self.WinHeight = 200
         self.parent = parent
-        self.x = int((monitor.width - self.WinWidth) / 2)
-        self.y = int((monitor.height - self.WinHeight) / 2)
+        self.x = int((monitor.width() - self.WinWidth) / 2)
+        self.y = int((monitor.height() - self.WinHeight) / 2)
         self.setGeometry(self.x, self.y, self.WinWidth, self.WinHeight)
 
         self.label = QLabel("Congratulations! You've won the game!", self)
@@ -386,10 +565,18 @@ class Clock(QGraphicsTextItem):
         self.elapsed_time = QTime(0, 0, 0)
         self.setPlainText("00:00")
 
+    def seconds(self) -> int:
+        return QTime(0, 0, 0).secsTo(self.elapsed_time)
+
+    def setSeconds(self, seconds: int):
+        self.timer.stop()
+        self.elapsed_time = QTime(0, 0, 0).addSecs(seconds)
+        self.setPlainText(self.elapsed_time.toString("mm:ss"))
+
     def update_time(self):
         self.elapsed_time = self.elapsed_time.addSecs(1)
         if self.elapsed_time.second() % 15 == 0:
-            self.parent.FunFact.update_fact()
+            self.parent.nextFunFact()
         time_str = self.elapsed_time.toString("mm:ss")
         self.setPlainText(time_str)
 
@@ -399,7 +586,7 @@ class FunFacts(QGraphicsTextItem):
         self.width = width
         self.height = height
 
-        with open("funfacts.txt", "r", encoding="utf-8") as f:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "funfacts.txt"), "r", encoding="utf-8") as f:
             self.facts = f.readlines()
         random.shuffle(self.facts)
         self.index = 0
@@ -430,6 +617,35 @@ class FunFacts(QGraphicsTextItem):
         y = self.height - text_rect.height()/2 - pad - size/2
         self.setPos(x, y)
 
+class DropIndex:
+    """Drop zones of the foundations and tableau columns. A pointer position
+    is resolved by arithmetic on the column pitch, so it is cheap enough to
+    query on every drag frame."""
+    def __init__(self, parent):
+        self.parent = parent
+        self.rects = [None] * PILES
+        for pile in range(FOUNDATION, PILES):
+            self.update(pile)
+
+    def update(self, pile: int):
+        """Resize the zone of a pile after cards were added or removed."""
+        if pile < FOUNDATION:
+            return
+        container, index = self.parent.pileView(pile)
+        height = C_HEIGHT + max(len(container.cards[index]) - 1, 0) * container.y_offset
+        self.rects[pile] = QRectF(container.startpos.x() + index * container.x_offset,
+                                  container.startpos.y(), C_WIDTH, height)
+
+    def pileAt(self, pos: QPointF):
+        """The foundation or tableau pile under pos, or None."""
+        for container, first, count in ((self.parent.Foundation, FOUNDATION, 4),
+                                        (self.parent.Tableau, TABLEAU, 7)):
+            column = int((pos.x() - container.startpos.x()) // container.x_offset)
+            if 0 <= column < count and self.rects[first + column].contains(pos):
+                return first + column
+        return None
+
+
 class RoundedRect(QGraphicsRectItem):
     def __init__(self, x, y, w, h, radius=12, action=None, text=""):
         super().__init__(x, y, w, h)
@@ -446,75 +662,147 @@ class RoundedRect(QGraphicsRectItem):
         painter.setPen(QPen(QColor(255, 255, 255)))
         painter.drawText(self.rect(), Qt.AlignCenter, self._text)
 
+    def setText(self, text: str):
+        self._text = text
+        self.update()
+
     def mousePressEvent(self, event):
         if self._action:
             self._action()
         return super().mousePressEvent(event)
 
 
+class BootTrace(QObject):
+    """Startup phase timings, printed when the window first paints. Each mark
+    ends a phase that began at the previous one, the first at module import."""
+    def __init__(self, window, enabled: bool):
+        super().__init__(window)
+        self.window = window
+        self.enabled = enabled
+        self.phases = [("start", BOOT_START)]
+        if enabled:
+            self.mark("imports")
+            window.viewport().installEventFilter(self)
+
+    def mark(self, phase: str):
+        if self.enabled:
+            self.phases.append((phase, time.perf_counter()))
+
+    def eventFilter(self, obj, event):
+        if event.type() != QEvent.Paint:
+            return False
+        obj.removeEventFilter(self)
+        self.window.viewportEvent(event)
+        self.mark("first paint")
+        steps = [f"{name} {(end - begin) * 1000:.1f}" for (_, begin), (name, end) in zip(self.phases, self.phases[1:])]
+        print(f"Boot: {', '.join(steps)} ms; {(self.phases[-1][1] - BOOT_START) * 1000:.1f} ms in all")
+        return True
+
+
 class MainWindow(QGraphicsView):
-    def __init__(self):
+    def __init__(self, seed: int=None, drawCount: int=None):
         super().__init__()
+        self.DrawCount = drawCount or DRAW_COUNTS[0]   # for the next deal
+        self.boot = BootTrace(self, BOOT_TRACE)
         self.initUI()
+        self.boot.mark("widgets")
         self.initScene()
-        self.initCards()
+        self.boot.mark("scene")
+        self.initCards(seed)
+        self.applyRenderProfile(RENDER_PROFILE)
+        self.boot.mark("deal")
+        if BOOT_TRACE:
+            print(self.svg.report())
+
+    def applyRenderProfile(self, name: str):
+        """Set up painting as RENDER_PROFILES[name] says. Static items (buttons,
+        panels and the foundation placeholders) can be cached as device pixmaps,
+        which are only redrawn when their text or the view scale changes."""
+        profile = RENDER_PROFILES[name]
+        self.setRenderHint(QPainter.Antialiasing, profile["antialias"])
+        self.setCacheMode(QGraphicsView.CacheBackground if profile["cacheBackground"] else QGraphicsView.CacheNone)
+        self.setViewportUpdateMode(profile["update"])
+        mode = QGraphicsItem.DeviceCoordinateCache if profile["cacheItems"] else QGraphicsItem.NoCache
+        for item in self.scene.items():
+            if isinstance(item, RoundedRect):
+                item.setCacheMode(mode)
+        for item in self.foundationcards + [self.RestartButton, self.Stock.reloadItem]:
+            item.setCacheMode(mode)
+        self.renderProfile = name
+
+    @property
+    def WinWindow(self) -> "WinScreen":
+        if self._winWindow is None:
+            self._winWindow = WinScreen(self, self.monitor)
+        return self._winWindow
+
+    def initFunFacts(self):
+        self.FunFact = FunFacts(self.WindowWidth, self.WindowHeight)
+        self.scene.addItem(self.FunFact)
+
+    def nextFunFact(self):
+        if self.FunFact is not None:
+            self.FunFact.update_fact()
 
     def initUI(self):
-        self.monitor = get_monitors()[0]
+        self.monitor = QApplication.primaryScreen().geometry()
         self.setMouseTracking(True)
-        self.setRenderHint(QPainter.Antialiasing)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setWindowTitle("Premium Solitaire")
 
-        self.WindowWidth = int(self.monitor.width*0.7)
-        self.WindowHeight = int(self.monitor.height*0.7)
-        self.center = QPoint(int(self.monitor.width/2), int(self.monitor.height/2))
+        # the scene keeps this size; resizing the window scales the view
+        self.WindowWidth = int(self.monitor.width()*0.7)
+        self.WindowHeight = int(self.monitor.height()*0.7)
+        self.center = self.monitor.center()
         self.topleft = QPoint((self.center.x() - int(self.WindowWidth/2)), (self.center.y() - int(self.WindowHeight/2)))
         self.setGeometry(self.topleft.x(), self.topleft.y(), self.WindowWidth, self.WindowHeight)
-        self.setFixedSize(self.WindowWidth, self.WindowHeight)
+        self.setMinimumSize(self.WindowWidth // 3, self.WindowHeight // 3)
+        self.rescaleTimer = QTimer(self)
+        self.rescaleTimer.setSingleShot(True)
+        self.rescaleTimer.timeout.connect(self.rescaleCards)
 
         self.path = os.path.dirname(os.path.abspath(__file__))
-
-        self.svg = SVGManager()
+        self.library = DealLibrary.open(os.path.join(self.path, DEAL_LIBRARY))
+        dataDir = QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation) or os.path.expanduser("~")
+        self.savePath = os.path.join(dataDir, "PremiumSolitaire", SAVE_FILE)
+        self.replayPath = os.path.join(dataDir, "PremiumSolitaire", REPLAY_FILE)
+        self.replay = None
+        self.Difficulty = DEAL_DIFFICULTY
+
+        self.boot.mark("window")
+        self.svg = SVGManager(warmup=not CARD_ATLAS)
+        self.svg.setDevicePixelRatio(self.devicePixelRatioF())
         image = self.svg.getSVG("win_icon_black", (128, 128))
         icon = QIcon(image)
         self.setWindowIcon(icon)
+        self.boot.mark("svg")
+        QShortcut(QKeySequence.Undo, self, self.Undo)
+        QShortcut(QKeySequence.Redo, self, self.Redo)
+        QShortcut(QKeySequence("Ctrl+Y"), self, self.Redo)
 
-        self.WinWindow = WinScreen(self, self.monitor)
+        self._winWindow = None  # built on the first win
         self.Clock = Clock(self.WindowWidth, self.WindowHeight, self)
-        self.FunFact = FunFacts(self.WindowWidth, self.WindowHeight)
+        self.FunFact = None     # filled in once the event loop runs, see initFunFacts
 
     def initScene(self):
-        background = QPixmap(self.path + r"\images\bg1.png")
+        # only the scene rect of the background is ever shown; decode just that
+        reader = QImageReader(os.path.join(self.path, "images", "bg1.png"))
+        reader.setClipRect(QRect(0, 0, self.WindowWidth, self.WindowHeight).intersected(QRect(QPoint(0, 0), reader.size())))
+        background = QPixmap.fromImage(reader.read())
         self.scene = QGraphicsScene(self)
         self.scene.setSceneRect(0, 0, self.WindowWidth, self.WindowHeight)
         self.scene.setBackgroundBrush(QBrush(background))
         self.setScene(self.scene)
 
-        background = QPixmap(self.path + r"\images\bg1.png")
-        self.scene = QGraphicsScene(self)
-        self.scene.setSceneRect(0, 0, self.WindowWidth, self.WindowHeight)
-        self.scene.setBackgroundBrush(QBrush(background))
-        self.setScene(self.scene)
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
         self.foundationcards = []
-        self.basecards = []
-        for i in range(7):
-            rect = QGraphicsRectItem(0, 0, C_WIDTH, C_HEIGHT)
-            rect.setPos(50 + i * (C_WIDTH + 10), C_HEIGHT + 100)
-            rect.setBrush(QColor(255, 255, 255, 0))
-            rect.setPen(QPen(Qt.NoPen))
-            self.basecards.append(rect)
-            self.scene.addItem(rect)
 
         rsSize = 100
         rsPad = 20
         RestartImage = self.svg.getSVG("reload", (rsSize, rsSize))
-        RestartButton = QGraphicsPixmapItem()
-        RestartButton.setPixmap(RestartImage)
+        RestartButton = SpriteItem()
+        RestartButton.setImage(RestartImage)
+        self.RestartButton = RestartButton
         RestartButton.setPos(self.WindowWidth - rsSize - rsPad, self.WindowHeight - rsSize - rsPad)
         RestartButton.setOpacity(1)
         path = QPainterPath()
@@ -522,7 +810,7 @@ class MainWindow(QGraphicsView):
         RestartButton.shape = lambda : path
         RestartButton.mousePressEvent = lambda event: self.ShuffleCards()
 
-        FunFactBG = RoundedRect(rsPad, self.WindowHeight - rsSize - rsPad, self.WindowWidth - rsSize - rsPad*3, rsSize, radius=12, action=self.FunFact.update_fact)
+        FunFactBG = RoundedRect(rsPad, self.WindowHeight - rsSize - rsPad, self.WindowWidth - rsSize - rsPad*3, rsSize, radius=12, action=self.nextFunFact)
         color = "#FBF0DF"
         FunFactBG.setBrush(QColor(color))
         FunFactBG.setPen(QPen(Qt.NoPen))
@@ -537,9 +825,26 @@ class MainWindow(QGraphicsView):
         ClockBG.setPen(QPen(Qt.NoPen))
         self.scene.addItem(ClockBG)
 
+        self.estimator = None   # the process pool and its imports wait for the first estimate
+        self.EstimateOn = WIN_ESTIMATE
+        self.WinChance = RoundedRect(x + w + pad*2, y, w, h, radius=12, action=self.ToggleWinEstimate,
+                                     text="Win: ..." if self.EstimateOn else "Win: off")
+        self.WinChance.setBrush(QColor("#00392B"))
+        self.WinChance.setPen(QPen(Qt.NoPen))
+        self.scene.addItem(self.WinChance)
+        self.estimateTimer = QTimer(self)
+        self.estimateTimer.setSingleShot(True)
+        self.estimateTimer.timeout.connect(self.startEstimate)
+        self.estimatePoll = QTimer(self)
+        self.estimatePoll.timeout.connect(self.updateEstimate)
+
         w, h = self.Clock.text_width+pad*3, self.Clock.text_height+pad*2
         x, y = self.Clock.pos().x()-pad, self.Clock.pos().y() + h + pad*2
         self.Autocompletable = False
+        self.AutoCompleteSpeed = AUTO_COMPLETE_MS
+        self.autoPlan = []
+        self.autoTimer = QTimer(self)
+        self.autoTimer.timeout.connect(self.autoCompleteStep)
         self.AutoCompleteBtn = RoundedRect(x, y, w, h, radius=12, action=self.AutoComplete, text="Press to\nAuto Complete")
         color = "#000000"
         self.AutoCompleteBtn.setBrush(QColor(color))
@@ -547,209 +852,602 @@ class MainWindow(QGraphicsView):
         self.AutoCompleteBtn.hide()
         self.scene.addItem(self.AutoCompleteBtn)
 
+        self.WinnableOnly = False
+        self.vetJob = None          # the background search for the next winnable deal
+        self.dealWaiting = False    # New Game was asked for before that search finished
+        y = self.WindowHeight - rsSize - rsPad*2 - h
+        self.WinnableBtn = RoundedRect(self.WindowWidth - rsSize - rsPad, y, rsSize, h, radius=12,
+                                       action=self.ToggleWinnableOnly, text="Winnable\ndeals: off")
+        self.WinnableBtn.setBrush(QColor("#00392B"))
+        self.WinnableBtn.setPen(QPen(Qt.NoPen))
+        self.scene.addItem(self.WinnableBtn)
+
+        self.HintBtn = RoundedRect(self.WindowWidth - rsSize - rsPad, y - h - rsPad, rsSize, h, radius=12,
+                                   action=self.ShowHint, text="Hint")
+        self.HintBtn.setBrush(QColor("#00392B"))
+        self.HintBtn.setPen(QPen(Qt.NoPen))
+        self.scene.addItem(self.HintBtn)
+        QShortcut(QKeySequence("H"), self, self.ShowHint)
+
+        self.DrawBtn = RoundedRect(self.WindowWidth - rsSize - rsPad, y - (h + rsPad) * 2, rsSize, h, radius=12,
+                                   action=self.ToggleDrawCount, text=f"Draw {self.DrawCount}")
+        self.DrawBtn.setBrush(QColor("#00392B"))
+        self.DrawBtn.setPen(QPen(Qt.NoPen))
+        self.scene.addItem(self.DrawBtn)
+        self.hintJob = None
+        self.HintMarks = []
+        for color in ("#66E0FF", "#7CFC8A"):
+            mark = RoundedRect(0, 0, C_WIDTH, C_HEIGHT, radius=12)
+            mark.setBrush(QColor(255, 255, 255, 40))
+            mark.setPen(QPen(QColor(color), 4))
+            mark.setAcceptedMouseButtons(Qt.NoButton)
+            mark.setZValue(998)
+            mark.hide()
+            self.scene.addItem(mark)
+            self.HintMarks.append(mark)
+        self.hintTimer = QTimer(self)
+        self.hintTimer.setSingleShot(True)
+        self.hintTimer.timeout.connect(self.hideHint)
+
+        self.profiler = FrameProfiler(self)
+        QShortcut(QKeySequence("F12"), self, self.profiler.toggle)
+        QShortcut(QKeySequence("Shift+F12"), self, self.DumpProfile)
+
         self.scene.addItem(RestartButton)
         self.scene.addItem(self.Clock)
-        self.scene.addItem(self.FunFact)
+        QTimer.singleShot(0, self.initFunFacts)
 
-    def initCards(self):
+    def initCards(self, seed: int=None):
+        self.animator = Animator(self)
         self.all_cards = []
-
-        self.suits = ["Spades", "Hearts", "Diamonds", "Clubs"]
-        self.oppositeSuits = {"Spades": ["Hearts", "Diamonds"],
-                              "Hearts": ["Spades", "Clubs"],
-                              "Diamonds": ["Spades", "Clubs"],
-                              "Clubs": ["Hearts", "Diamonds"]}
-        ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+        self.game = GameState(self.DrawCount)
+        self.cardItems = [None] * 52
+
+        self.suits = SUITS
+        self.sprites = None
+        self.faces = None
+        self.faceNames = ["backside", "reloadCard"] + [f"{rank}{suit[0]}" for suit in self.suits for rank in RANKS]
+        self.renderJob = None
+        if CARD_ATLAS and self.svg.hasAtlas(self.faceNames, (C_WIDTH, C_HEIGHT)):
+            self.sprites = self.svg.getAtlas(self.faceNames, (C_WIDTH, C_HEIGHT))
+            if BOOT_TRACE:
+                print(self.svg.memoryReport())
+        else:
+            # faces render on worker threads; cards show their back until they arrive
+            self.placeholder = self.svg.getSVG("backside", (C_WIDTH, C_HEIGHT))
+            self.renderJob = self.svg.prerender(self.faceNames, (C_WIDTH, C_HEIGHT))
         self.Foundation = Foundation(QPointF(PAD, PAD), self)
         self.Tableau = Tableau(QPointF(PAD, C_HEIGHT+PAD*2), self)
         self.Stock = Stock(QPointF(self.WindowWidth - C_WIDTH - PAD, PAD), self)
         self.Waste = Waste(QPointF(self.WindowWidth - C_WIDTH*2 - PAD*2, PAD), self)
-
-        backside = self.svg.getSVG("backside", (C_WIDTH, C_HEIGHT))
+        self.dropIndex = DropIndex(self)
+        self.dropTarget = None
+        self.DropHighlight = RoundedRect(0, 0, C_WIDTH, C_HEIGHT, radius=12)
+        self.DropHighlight.setBrush(QColor(255, 255, 160, 60))
+        self.DropHighlight.setPen(QPen(QColor("#FFE066"), 4))
+        self.DropHighlight.setAcceptedMouseButtons(Qt.NoButton)
+        self.DropHighlight.setZValue(999)
+        self.DropHighlight.hide()
+        self.scene.addItem(self.DropHighlight)
+
+        backside = self.cardImage("backside")
         for i, suit in enumerate(self.suits):
-            for rank_numb, rank in enumerate(ranks):
-                card_image = self.svg.getSVG(f"{rank}{suit[0]}", (C_WIDTH, C_HEIGHT))
+            for rank_numb, rank in enumerate(RANKS):
+                card_image = self.cardImage(f"{rank}{suit[0]}")
                 card = Card(rank_numb+1, suit, card_image, backside, self)
                 self.scene.addItem(card)
                 self.all_cards.append(card)
+                self.cardItems[card.code] = card
+
+        if self.renderJob is not None:
+            if self.renderJob.done:
+                self.facesReady(self.renderJob.pixmaps)
+            else:
+                self.renderJob.finished.connect(self.facesReady)
+        if seed is not None or not self.RestoreGame():
+            self.ShuffleCards(seed)
+
+    def facesReady(self, pixmaps: dict):
+        job = self.sender()
+        if job is not None and job is not self.renderJob:
+            return  # rendered for a size the window has since left
+        if CARD_ATLAS:
+            first = self.sprites is None
+            self.sprites = self.svg.getAtlas(self.faceNames, (C_WIDTH, C_HEIGHT), images=pixmaps)
+            if BOOT_TRACE and first:
+                print(self.svg.memoryReport())
+        else:
+            self.faces = pixmaps
+        self.renderJob = None
+        self.refreshImages()
 
-        self.ShuffleCards()
+    def refreshImages(self):
+        backside = self.cardImage("backside")
+        for card in self.all_cards:
+            card.image = self.cardImage(cardName(card.code))
+            card.backside = backside
+            card.updateState()
+        for suit, bgcard in zip(self.suits, self.foundationcards):
+            bgcard.setImage(self.cardImage(f"A{suit[0]}"))
+        self.Stock.reloadItem.setImage(self.cardImage("reloadCard"))
+
+    def resizeEvent(self, event):
+        scale = min(self.width() / self.WindowWidth, self.height() / self.WindowHeight)
+        self.setTransform(QTransform.fromScale(scale, scale))
+        self.rescaleTimer.start(RESCALE_DELAY)
+        return super().resizeEvent(event)
+
+    def rescaleCards(self):
+        """Re-rasterize at the pixel density the view now draws at. Until the
+        crisp images arrive the cards keep their current ones, scaled."""
+        if not self.svg.setDevicePixelRatio(self.transform().m11() * self.devicePixelRatioF()):
+            return
+        if self.renderJob is not None:
+            self.renderJob.cancelled = True
+        size = (C_WIDTH, C_HEIGHT)
+        self.RestartButton.setImage(self.svg.getSVG("reload", (100, 100)))
+        if CARD_ATLAS and self.svg.hasAtlas(self.faceNames, size):
+            self.renderJob = None
+            self.sprites = self.svg.getAtlas(self.faceNames, size)
+            self.refreshImages()
+            return
+        if CARD_ATLAS:
+            nearest = self.svg.nearestAtlas(self.faceNames, size)
+            if nearest is not None and nearest is not self.sprites:
+                self.sprites = nearest
+                self.refreshImages()
+        else:
+            nearest = {name: self.svg.nearestSVG(name, size) for name in self.faceNames}
+            if None not in nearest.values() and nearest != self.faces:
+                self.faces = nearest
+                self.refreshImages()
+        self.renderJob = self.svg.prerender(self.faceNames, size)
+        if self.renderJob.done:
+            self.facesReady(self.renderJob.pixmaps)
+        else:
+            self.renderJob.finished.connect(self.facesReady)
+
+    def cardImage(self, name: str):
+        """A card-sized image: an atlas sprite in atlas mode, else its own pixmap,
+        or the backside placeholder while the faces are still rendering."""
+        if self.sprites is not None:
+            return self.sprites[name]
+        if self.faces is not None:
+            return self.faces[name]
+        return self.placeholder
+
+    def ShuffleCards(self, seed: int=None):
+        """Deal a new game, or the game of a given seed."""
+        self.CancelAutoComplete()
+        if seed is not None:
+            self.seed = seed
+            order = shuffledDeck(seed)
+        elif self.WinnableOnly and self.usesLibrary():
+            self.seed, _, _, order = self.library.sample(self.Difficulty)
+        elif self.WinnableOnly:
+            job = self.vetJob
+            if job is None or job.seed is None or job.drawCount != self.DrawCount:
+                # keep playing the current game until the search finds one
+                self.dealWaiting = True
+                self.setWindowTitle("Premium Solitaire - Finding a winnable deal...")
+                self.prepareDeal()
+                return
+            self.vetJob = None
+            self.seed = job.seed
+            order = shuffledDeck(job.seed)
+        else:
+            self.seed = random.randrange(2**32)
+            order = shuffledDeck(self.seed)
+        self.dealWaiting = False
+        self.game.drawCount = self.DrawCount
+        self.DrawBtn.setText(f"Draw {self.DrawCount}")
+        self.game.deal(order)
+        self.layoutCards()
+        self.CheckAutoComplete()
+        self.Clock.reset()
+        self.startReplay()
+        self.restartEstimate()
+        self.prepareDeal()
+
+    def usesLibrary(self) -> bool:
+        """Winnable-only deals come from the deal library rather than the solver."""
+        return self.library is not None and len(self.library) > 0 and self.DrawCount == 1
+
+    def prepareDeal(self):
+        """Make sure the next winnable-only deal is being searched for."""
+        job = self.vetJob
+        if not self.WinnableOnly or self.usesLibrary():
+            return
+        if job is not None and job.drawCount == self.DrawCount and not job.cancelled:
+            return
+        self.cancelDeal()
+        from DealVetter import requestDeal
+        self.vetJob = requestDeal(self.DrawCount, VET_TIME)
+        self.vetJob.finished.connect(self.dealVetted)
+
+    def dealVetted(self, job):
+        if job is self.vetJob and job.seed is not None and self.dealWaiting:
+            self.ShuffleCards()
+
+    def cancelDeal(self):
+        if self.vetJob is not None:
+            self.vetJob.cancelled = True
+            self.vetJob = None
+
+    def startReplay(self):
+        """Record the current deal, and the moves already made, to the replay file.
+        Undone moves are written as played and then undone, so redo still replays."""
+        self.setWindowTitle(f"Premium Solitaire - Game #{self.seed}")
+        if self.replay is not None:
+            self.replay.close()
+        future = self.game.future
+        records = list(self.game.history) + list(reversed(future)) + [UNDO] * len(future)
+        try:
+            self.replay = ReplayWriter(self.replayPath, self.seed, records, self.game.drawCount)
+        except OSError as e:
+            self.replay = None
+            print(f"Could not record the game: {e}")
+
+    def recordMove(self, word: int):
+        self.hideHint()
+        self.restartEstimate()
+        if self.replay is not None:
+            self.replay.record(word)
+
+    def restartEstimate(self):
+        """Drop the estimate of the old position; a new one starts once moves pause."""
+        if not self.EstimateOn:
+            return
+        if self.estimator is not None:
+            self.estimator.cancel()
+        self.estimatePoll.stop()
+        self.estimateTimer.start(150)
+
+    def startEstimate(self):
+        if self.game.isWon():
+            self.WinChance.setText("Win: 100%")
+            return
+        self.WinChance.setText("Win: ...")
+        if self.estimator is None:
+            from WinEstimate import WinEstimator
+            self.estimator = WinEstimator()
+        self.estimator.start(self.game)
+        self.estimatePoll.start(100)
+
+    def updateEstimate(self):
+        estimator = self.estimator
+        if estimator.poll():
+            chance = estimator.lowerBound()
+            if chance is None:
+                text = "Win: ?"
+            else:
+                text = f"Win: {chance:.0%}" if estimator.wins == estimator.done else f"Win: ≥{chance:.0%}"
+            if not estimator.finished:
+                text += f"\n{estimator.done}/{estimator.total}"
+            elif estimator.unknown:
+                text += f"\n{estimator.unknown} unsure"
+            self.WinChance.setText(text)
+        if self.estimator.finished:
+            self.estimatePoll.stop()
+
+    def ToggleWinEstimate(self):
+        self.EstimateOn = not self.EstimateOn
+        if self.EstimateOn:
+            self.restartEstimate()
+        else:
+            self.estimateTimer.stop()
+            self.estimatePoll.stop()
+            if self.estimator is not None:
+                self.estimator.cancel()
+            self.WinChance.setText("Win: off")
+
+    def ShowHint(self):
+        """Search for a hint off the GUI thread; show the best move found when the
+        search ends or HINT_BUDGET_MS runs out, whichever comes first."""
+        from HintEngine import requestHint
+        job = requestHint(self.game, HINT_BUDGET_MS / 1000)
+        job.position = self.game.pack()
+        job.shown = False
+        job.finished.connect(self.hintReady)
+        QTimer.singleShot(HINT_BUDGET_MS, lambda: self.hintReady(job))
+        self.hintJob = job
+
+    def hintReady(self, job):
+        if job is not self.hintJob or job.shown:
+            return
+        job.shown = True
+        if job.best is None or job.position != self.game.pack():
+            return
+        src, dst, count = job.best
+        container, index = self.pileView(src)
+        cards = container.cards[index][-count:] if src != STOCK else container.cards[index][-1:]
+        source = QRectF()
+        for card in cards:
+            source = source.united(QRectF(card.position.x(), card.position.y(), C_WIDTH, C_HEIGHT))
+        if dst >= FOUNDATION:
+            rect = self.dropIndex.rects[dst]
+            target = QRectF(rect.x(), rect.bottom() - C_HEIGHT, C_WIDTH, C_HEIGHT)
+        else:
+            corner = self.pileView(dst)[0].cardPosition(0)
+            target = QRectF(corner.x(), corner.y(), C_WIDTH, C_HEIGHT)
+        for mark, rect in zip(self.HintMarks, (source, target)):
+            mark.setRect(rect)
+            mark.show()
+        self.hintTimer.start(HINT_SHOW_MS)
+
+    def hideHint(self):
+        for mark in self.HintMarks:
+            mark.hide()
+
+    def DumpProfile(self):
+        """Write the frames the profiler holds as a trace next to the saved game."""
+        path = os.path.join(os.path.dirname(self.savePath), TRACE_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frames = self.profiler.dump(path)
+        print(f"Frame trace: {frames} frames written to {path}")
+
+    def RestoreGame(self) -> bool:
+        """Lay out the game saved on exit, in place and without the deal animation."""
+        saved = loadGame(self.savePath)
+        if saved is None:
+            return False
+        self.game, self.seed, seconds = saved
+        self.DrawCount = self.game.drawCount
+        self.DrawBtn.setText(f"Draw {self.DrawCount}")
+        self.layoutCards()
+        for card in self.all_cards:
+            card.updatePlace(0)
+        self.CheckAutoComplete()
+        self.Clock.setSeconds(seconds)
+        self.startReplay()
+        self.restartEstimate()
+        return True
 
-    def ShuffleCards(self):
+    def SaveGame(self):
+        if self.game.isWon() or not self.game.history:
+            deleteSave(self.savePath)
+            return
+        try:
+            saveGame(self.savePath, self.game, self.seed, self.Clock.seconds())
+        except OSError as e:
+            print(f"Could not save the game: {e}")
+
+    def ToggleDrawCount(self):
+        """Switch the draw mode; it takes effect with the next deal."""
+        self.DrawCount = DRAW_COUNTS[(DRAW_COUNTS.index(self.DrawCount) + 1) % len(DRAW_COUNTS)] \
+            if self.DrawCount in DRAW_COUNTS else DRAW_COUNTS[0]
+        text = f"Draw {self.DrawCount}"
+        self.DrawBtn.setText(text if self.DrawCount == self.game.drawCount else text + "\nnext deal")
+        self.prepareDeal()
+
+    def ToggleWinnableOnly(self):
+        self.WinnableOnly = not self.WinnableOnly
+        self.WinnableBtn.setText("Winnable\ndeals: on" if self.WinnableOnly else "Winnable\ndeals: off")
+        if self.WinnableOnly:
+            self.prepareDeal()
+            return
+        self.cancelDeal()
+        if self.dealWaiting:
+            self.ShuffleCards()
+
+    def pileView(self, pile: int):
+        """The container and column index showing one of the game's piles."""
+        if pile >= TABLEAU:
+            return self.Tableau, pile - TABLEAU
+        if pile >= FOUNDATION:
+            return self.Foundation, pile - FOUNDATION
+        if pile == WASTE:
+            return self.Waste, 0
+        return self.Stock, 0
+
+    def layoutCards(self):
+        """Rebuild every container from the game state."""
         for container in [self.Foundation, self.Tableau, self.Stock, self.Waste]:
             container.reset()
-        random.shuffle(self.all_cards)
-        removes = 0
-        n = 24+(7*removes-(sum(range(0, removes))))
-        for i in range(n):
-            self.Stock.addCard(self.all_cards[i], faceup=False)
-        for i in range(7-removes):
-            for j in range(i+1):
-                faceup = (i == j)
-                self.Tableau.addCard(self.all_cards[n], faceup=faceup, index=i)
-                n += 1
-        self.Clock.reset()
+        self.syncPiles(*range(PILES))
+
+    def syncPiles(self, *piles):
+        """Make the given piles show what the game state holds for them."""
+        for pile in piles:
+            container, index = self.pileView(pile)
+            container.cards[index] = []
+            for pos, code in enumerate(self.game.piles[pile]):
+                container.addCard(self.cardItems[code], faceup=self.game.isFaceUp(pile, pos), index=index)
+            self.dropIndex.update(pile)
+        if WASTE in piles:
+            self.Waste.updateOrder(full=True)
+
+    def Undo(self):
+        """Take back the last move; only the two piles it touched are redrawn."""
+        self.CancelAutoComplete()
+        won = self.game.isWon()
+        record = self.game.undo()
+        if record is not None:
+            self.recordMove(UNDO)
+            self.syncPiles(record[0], record[1])
+            self.CheckAutoComplete()
+            if won:
+                if self._winWindow is not None:
+                    self._winWindow.hide()
+                self.Clock.start()
+
+    def Redo(self):
+        self.CancelAutoComplete()
+        record = self.game.redo()
+        if record is not None:
+            self.recordMove(REDO)
+            self.syncPiles(record[0], record[1])
+            self.CheckAutoComplete()
+            self.CheckWin()
+
+    def applyMove(self, move) -> bool:
+        if not self.game.isLegal(move):
+            return False
+        self.CancelAutoComplete()
+        src, dst, count = move
+        flags = self.game.apply(move)
+        self.recordMove(self.game.history[-1])
+        source, src_index = self.pileView(src)
+        target, dst_index = self.pileView(dst)
+        if dst == STOCK:
+            self.Stock.recycle(self.Waste)
+        else:
+            moved = source.takeCards(src_index, count)
+            if src == STOCK:
+                moved = moved[::-1]
+            for card in moved:
+                target.addCard(card, faceup=True, index=dst_index)
+        if flags & FLIPPED:
+            self.flipTop(src)
+        self.dropIndex.update(src)
+        self.dropIndex.update(dst)
+        if WASTE in (src, dst):
+            self.Waste.updateOrder()
+        return True
+
+    def collectCard(self, card: Card, animate: bool=True):
+        src, pos = self.game.locate(card.code)
+        flags = self.game.collect(src, pos)
+        self.recordMove(self.game.history[-1])
+        card.container.removeCard(card)
+        self.Foundation.addCard(card, faceup=True, index=card.code // 13)
+        if not animate:
+            card.updatePlace(0)
+        if flags & FLIPPED:
+            self.flipTop(src)
+        self.dropIndex.update(src)
+        self.dropIndex.update(FOUNDATION + card.code // 13)
+
+    def flipTop(self, pile: int):
+        container, index = self.pileView(pile)
+        top = container.cards[index][-1]
+        top.State = "faceup"
+        top.updateState()
 
     def CheckWin(self):
-        for stack in self.Foundation.cards:
-            if len(stack) != 13:
-                return False
-        self.WinWindow.popUp(self.pos(), self.WindowWidth, self.WindowHeight)
+        if not self.game.isWon():
+            return False
+        self.WinWindow.popUp(self.pos(), self.width(), self.height())
         self.Clock.stop()
         return True
 
     def CheckAutoComplete(self):
-        for card in self.all_cards:
-            if card.State == "facedown" and card.container == self.Tableau:
-                self.Autocompletable = False
-                return False
+        if not self.game.canAutoComplete():
+            self.Autocompletable = False
+            self.AutoCompleteBtn.hide()
+            return False
         self.AutoCompleteBtn.show()
         self.Autocompletable = True
 
     def AutoComplete(self):
-        if not self.Autocompletable:
+        """Plan every remaining foundation move and play them from a timer,
+        one card every AutoCompleteSpeed ms, their animations overlapping."""
+        if not self.Autocompletable or self.autoTimer.isActive():
             return
-        Run = True
         self.AutoCompleteBtn.hide()
-        topfountain = []
         self.Clock.start()
-        for stack in self.Foundation.cards:
-            if stack:
-                topfountain.append(stack[-1].value)
-            else:
-                topfountain.append(0)
-        while Run:
-            Run = False
-            toptableau = []
-            for stack in self.Tableau.cards:
-                if stack:
-                    toptableau.append(stack[-1])
-            for card in self.Waste.cards[0] + toptableau + self.Stock.cards[0]:
-                if card.container != self.Foundation:
-                    symbol_index = self.suits.index(card.symbol)
-                    if card.value == topfountain[symbol_index] + 1:
-                        card.container.removeCard(card)
-                        self.Foundation.addCard(card, faceup=True, index=symbol_index)
-                        topfountain[symbol_index] += 1
-                        Run = True
-                        break
-            QApplication.processEvents()
-            _loop = QEventLoop()
-            QTimer.singleShot(100, _loop.quit)  # 100 ms delay (adjust as needed)
-            _loop.exec_()
-            QApplication.processEvents()
+        self.autoPlan = self.game.collectPlan()[::-1]
+        if self.AutoCompleteSpeed <= 0:
+            while self.autoPlan:
+                self.autoCompleteStep(animate=False)
+            return
+        self.autoTimer.start(self.AutoCompleteSpeed)
 
-        self.Autocompletable = False
-        self.CheckWin()
+    def autoCompleteStep(self, animate: bool=True):
+        if not self.autoPlan:
+            self.autoTimer.stop()
+            self.Autocompletable = False
+            self.CheckWin()
+            return
+        step = self.autoPlan.pop()
+        if step != self.game.nextCollect():
+            # the table changed under the plan
+            self.autoTimer.stop()
+            self.autoPlan = []
+            self.CheckAutoComplete()
+            return
+        src, pos = step
+        self.collectCard(self.cardItems[self.game.piles[src][pos]], animate)
+        if not self.autoPlan and not self.autoTimer.isActive():
+            self.autoCompleteStep()
+
+    def CancelAutoComplete(self):
+        """Stop a running auto-complete; the button brings it back."""
+        if not self.autoTimer.isActive():
+            return
+        self.autoTimer.stop()
+        self.autoPlan = []
+        self.CheckAutoComplete()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.CancelAutoComplete()
+        return super().keyPressEvent(event)
 
     def CheckAutomaticMoves(self, card: Card):
-        value = card.value
-        symbol = card.symbol
-        FoundationList = ["Spades", "Hearts", "Diamonds", "Clubs"]
-        if card.container == self.Waste and card.container.cards[0][-1] != card:
+        move = self.game.automaticMove(*self.game.locate(card.code))
+        if move is None:
             return False
-        for i, Stack in enumerate(self.Foundation.cards):
-            if card.container == self.Tableau:
-                if self.Tableau.cards[card.Index][-1] != card:
-                    break
-            if Stack:
-                top_card = Stack[-1]
-                if top_card.value == value - 1 and top_card.symbol == symbol:
-                    card.container.removeCard(card)
-                    self.Foundation.addCard(card, faceup=True, index=i)
-                    return True
-            else:
-                if value == 1 and symbol == FoundationList[i]:
-                    card.container.removeCard(card)
-                    self.Foundation.addCard(card, faceup=True, index=i)
-                    return True
-        for i, Stack in enumerate(self.Tableau.cards):
-            if Stack:
-                top_card = Stack[-1]
-                if not(top_card.value - 1 == value and top_card.symbol in self.oppositeSuits[symbol]):
-                    continue
-            else:
-                if value != 13:
-                    continue
-            cardgroup = []
-            if card.container == self.Tableau:
-                for c in self.Tableau.cards[card.Index][::-1]:
-                    if c == card:
-                        break
-                    cardgroup.append(c)
-            cardgroup.append(card)
-            cardgroup = cardgroup[::-1]
-            for c in cardgroup:
-                c.container.removeCard(c)
-                self.Tableau.addCard(c, faceup=True, index=i)
-            return True
-        return False
+        return self.applyMove(move)
 
-    def CheckMove(self, card: Card, destination: Card=None) -> bool:
-        value = card.value
-        symbol = card.symbol
-        index = 0
-        if isinstance(destination, Card):
-            if destination.container == self.Foundation:
-                if card.container == self.Tableau:
-                    if self.Tableau.cards[card.Index][-1] != card:
-                        return False
-                if destination.value == value - 1 and destination.symbol == symbol:
-                    card.container.removeCard(card)
-                    self.Foundation.addCard(card, faceup=True, index=destination.Index)
-                    return True
-                return False
-            elif destination.container == self.Tableau:
-                if destination.value - 1 == value and destination.symbol in self.oppositeSuits[symbol]:
-                    index = destination.Index
-                else:
-                    return False
-        elif destination in range(7) and value == 13 and self.Tableau.cards[destination] == []:
-            index = destination
+    def CheckMove(self, card: Card, destination: int=None) -> bool:
+        src, pos = self.game.locate(card.code)
+        if destination in range(7):
+            dst = TABLEAU + destination
         elif destination in range(10, 14):
-            dest_index = destination - 10
-            if card.container == self.Tableau:
-                if self.Tableau.cards[card.Index][-1] != card:
-                    return False
-            if value == 1 and card.symbol == ["Spades", "Hearts", "Diamonds", "Clubs"][dest_index]:
-                card.container.removeCard(card)
-                self.Foundation.addCard(card, faceup=True, index=dest_index)
-                return True
-            return False
+            dst = FOUNDATION + destination - 10
         else:
             return False
-        cardgroup = []
-        if card.container == self.Tableau:
-            for c in self.Tableau.cards[card.Index][::-1]:
-                if c == card:
-                    break
-                cardgroup.append(c)
-        cardgroup.append(card)
-        cardgroup = cardgroup[::-1]
-        for c in cardgroup:
-            c.container.removeCard(c)
-            self.Tableau.addCard(c, faceup=True, index=index)
-        return True
-            
+        return self.applyMove((src, dst, len(self.game.piles[src]) - pos))
+
+    def hoverDrop(self, dragcard: Card, mousepos: QPointF=None):
+        """Outline the pile under the pointer while the dragged run may drop there."""
+        pile = self.dropIndex.pileAt(mousepos) if mousepos is not None else None
+        if pile is not None:
+            move = (dragcard.container.pileOf(dragcard), pile, len(dragcard.Stacklist))
+            if not self.game.isLegal(move):
+                pile = None
+        if pile == self.dropTarget:
+            return
+        self.dropTarget = pile
+        if pile is None:
+            self.DropHighlight.hide()
+            return
+        rect = self.dropIndex.rects[pile]
+        self.DropHighlight.setRect(rect.x(), rect.bottom() - C_HEIGHT, C_WIDTH, C_HEIGHT)
+        self.DropHighlight.show()
+
     def releaseCard(self, dragcard: Card, mousepos: QPointF=None):
-        items = self.scene.items(mousepos)
-        for item in items:
-            if item in self.basecards:
-                return self.basecards.index(item)
-            if item in self.foundationcards:
-                return self.foundationcards.index(item) + 10
-            if isinstance(item, Card) and item != dragcard and item == item.container.cards[item.Index][-1] \
-                and item.container in [self.Tableau, self.Foundation] and item.State == "faceup":
-                return item
-        return -1
+        pile = self.dropIndex.pileAt(mousepos)
+        if pile is None:
+            return -1
+        if pile >= TABLEAU:
+            return pile - TABLEAU
+        return pile - FOUNDATION + 10
 
     def closeEvent(self, a0):
-        self.WinWindow.close()
+        self.SaveGame()
+        self.cancelDeal()
+        if self.renderJob is not None:
+            # worker threads must not emit to the job once the window is gone
+            self.renderJob.cancelled = True
+            QThreadPool.globalInstance().clear()
+            QThreadPool.globalInstance().waitForDone()
+        if self.estimator is not None:
+            self.estimator.shutdown()
+        if self.replay is not None:
+            self.replay.close()
+        if self._winWindow is not None:
+            self._winWindow.close()
+        if self.library is not None:
+            self.library.close()
         return super().closeEvent(a0)
 
 if __name__ == "__main__":
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
     app = QApplication(sys.argv)
-    gui = MainWindow()
+    gui = MainWindow(int(sys.argv[1]) if len(sys.argv) > 1 else None, int(sys.argv[2]) if len(sys.argv) > 2 else None)
     gui.show()
     sys.exit(app.exec_())
 
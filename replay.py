@@ -0,0 +1,105 @@
+"""Re-play a recorded game at full speed and check it against the rules.
+
+    python replay.py last-game.rpl
+    python replay.py last-game.rpl --repeat 1000      # as a rules-engine workload
+    python replay.py last-game.rpl --gui              # through MainWindow, offscreen
+
+The recording of the current game lives next to the saved game (see
+MainWindow.replayPath). Every record must be playable, the final table is
+checked for consistency, and its digest can be compared between runs or
+machines with --digest.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from GameState import PLUCKED, FOUNDATION, TABLEAU, PILES, unpackRecord
+from ReplayFile import ReplayError, readReplay, replayGame, UNDO, REDO
+
+
+def checkState(state):
+    """Raise ReplayError if the table or its indexes are inconsistent."""
+    cards = sorted(card for pile in state.piles for card in pile)
+    if cards != list(range(52)):
+        raise ReplayError("the table does not hold each card exactly once.")
+    for pile in range(PILES):
+        for pos, card in enumerate(state.piles[pile]):
+            if state.locate(card) != (pile, pos):
+                raise ReplayError(f"card {card} is indexed at the wrong place.")
+    if state.faceDown != sum(state.hidden):
+        raise ReplayError("the face-down count is out of step.")
+
+def digest(state) -> str:
+    return hashlib.sha1(state.pack()).hexdigest()[:16]
+
+
+def replayGui(seed: int, records, drawCount: int=1):
+    """Play the records through MainWindow and check the cards shown match the rules."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from main import MainWindow
+
+    class ReplayWindow(MainWindow):
+        def startReplay(self):
+            pass    # leave the recording being replayed alone
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = ReplayWindow(seed, drawCount)
+    for n, word in enumerate(records):
+        if word == UNDO:
+            window.Undo()
+        elif word == REDO:
+            window.Redo()
+        else:
+            src, dst, count, flags = unpackRecord(word)
+            if flags & PLUCKED:
+                window.collectCard(window.cardItems[window.game.piles[src][count]], animate=False)
+            elif not window.applyMove((src, dst, count)):
+                raise ReplayError(f"record {n} ({word:#06x}) cannot be played.")
+    for pile in range(PILES):
+        container, index = window.pileView(pile)
+        if [card.code for card in container.cards[index]] != window.game.piles[pile]:
+            raise ReplayError(f"pile {pile} shows different cards than the game holds.")
+    return window.game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-play a recorded Klondike game.")
+    parser.add_argument("replay", help="replay file")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="play it this many times")
+    parser.add_argument("--gui", action="store_true", help="also play it through the GUI, offscreen")
+    parser.add_argument("--digest", help="expected digest of the final table")
+    args = parser.parse_args(argv)
+
+    try:
+        seed, records, drawCount = readReplay(args.replay)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            state = replayGame(seed, records, drawCount=drawCount)
+        elapsed = time.perf_counter() - start
+        checkState(state)
+        if args.gui:
+            start = time.perf_counter()
+            shown = replayGui(seed, records, drawCount)
+            print(f"GUI replay: {time.perf_counter() - start:.3f}s")
+            if shown.pack() != state.pack():
+                raise ReplayError("the GUI ended on a different table.")
+    except (OSError, ReplayError) as e:
+        print(f"Replay failed: {e}")
+        return 1
+
+    moves = len(records) * args.repeat
+    founded = [len(state.piles[i]) for i in range(FOUNDATION, TABLEAU)]
+    print(f"Game #{seed}, draw {drawCount}: {len(records)} records, {len(state.history)} moves standing, "
+          f"foundations {founded}{', won' if state.isWon() else ''}")
+    print(f"{moves} records in {elapsed:.3f}s: {moves / elapsed if elapsed else 0:.0f} records/sec")
+    print(f"digest {digest(state)}")
+    if args.digest and args.digest != digest(state):
+        print(f"Digest mismatch: expected {args.digest}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())